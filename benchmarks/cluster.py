@@ -0,0 +1,93 @@
+"""Benchmark da busca distribuída: vazão e eficiência de escala do coordenador com 1, 2, 4... workers
+locais conectados por socket Unix (ou TCP), conferindo o top-K contra a busca serial.
+
+Com --kill-one, um worker é encerrado depois dos primeiros resultados de cada configuração
+com mais de um worker, para verificar que seus intervalos são reenviados e o top-K não muda.
+
+Uso: python -m benchmarks.cluster [--workers 1 2 4] [--n-combinations 3000] [--transport unix|tcp] [--kill-one]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from multiprocessing import cpu_count
+
+import numpy as np
+
+from cluster import Coordinator
+from collector import ResultCollector
+from combinatorics import rank_ranges
+from engine import RANGE_ENGINES
+
+def _run(stats, args, n_workers: int, address: str) -> dict:
+    coordinator = Coordinator(address, stats, args.seed, args.combination_size, args.engine)
+    coordinator.start_local_workers(n_workers)
+    if not coordinator.wait_for_workers(n_workers):
+        raise RuntimeError(f"Apenas parte dos {n_workers} workers conectou")
+    collector = ResultCollector(args.top_k, args.combination_size)
+    kill = args.kill_one and n_workers > 1
+    start = time.perf_counter()
+    for i, (_, _, records, failures, _) in enumerate(coordinator.results(rank_ranges(0, args.n_combinations, args.chunk_size))):
+        collector.add(records, failures)
+        if kill and i == n_workers:
+            coordinator.local_processes[0].kill()
+            kill = False
+    elapsed = time.perf_counter() - start
+    return {
+        'workers': n_workers,
+        'seconds': elapsed,
+        'combinations_per_second': args.n_combinations / elapsed,
+        'reissued_ranges': coordinator.reissued,
+        'top': collector.top(),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data-source', choices=['yfinance', 'local', 'synthetic'], default='synthetic')
+    parser.add_argument('--prices-file', default=None)
+    parser.add_argument('--engine', choices=sorted(RANGE_ENGINES), default='per-combination')
+    parser.add_argument('--workers', nargs='+', type=int, default=sorted({1, 2, 4, cpu_count()}))
+    parser.add_argument('--n-combinations', type=int, default=3000)
+    parser.add_argument('--combination-size', type=int, default=25)
+    parser.add_argument('--chunk-size', type=int, default=50)
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--transport', choices=['unix', 'tcp'], default='unix')
+    parser.add_argument('--kill-one', action='store_true')
+    parser.add_argument('--output', default='results/benchmarks/cluster.json')
+    args = parser.parse_args()
+
+    from data_loader import load_data, make_source, PriceCache, get_dow_jones_tickers
+    from utils import compute_return_statistics
+    train_data, _ = load_data(source=make_source(args.data_source, args.prices_file), cache=PriceCache())
+    stats = compute_return_statistics(train_data[[t for t in get_dow_jones_tickers() if t in train_data.columns]])
+
+    reference = ResultCollector(args.top_k, args.combination_size)
+    for start, count in rank_ranges(0, args.n_combinations, args.chunk_size):
+        reference.add(*RANGE_ENGINES[args.engine](stats, start, count, args.combination_size, args.seed))
+
+    report = {'cpu_count': cpu_count(), 'engine': args.engine, 'n_combinations': args.n_combinations,
+              'transport': args.transport, 'results': []}
+    with tempfile.TemporaryDirectory() as directory:
+        baseline = None
+        for n_workers in args.workers:
+            address = os.path.join(directory, f"coordinator_{n_workers}.sock") if args.transport == 'unix' else '127.0.0.1:0'
+            result = _run(stats, args, n_workers, address)
+            top = result.pop('top')
+            result['top_k_matches'] = bool(np.array_equal(top['rank'], reference.top()['rank'])
+                                           and np.array_equal(top['sharpe'], reference.top()['sharpe']))
+            baseline = baseline or result['combinations_per_second']
+            result['speedup'] = result['combinations_per_second'] / baseline
+            result['efficiency'] = result['speedup'] / (n_workers / args.workers[0])
+            report['results'].append(result)
+            print(f"workers={n_workers:<3} {result['combinations_per_second']:9.1f} combinações/s, "
+                  f"speedup {result['speedup']:.2f}, eficiência {result['efficiency']:.2f}, "
+                  f"reenviados {result['reissued_ranges']}, top-K idêntico: {result['top_k_matches']}")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
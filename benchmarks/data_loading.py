@@ -0,0 +1,55 @@
+"""Tempo de carga dos preços de treino e teste com o cache frio (fonte + gravação) e quente (memory-map).
+
+Uso: python -m benchmarks.data_loading [--source synthetic|yfinance|local] [--prices-file arquivo] [--repeats 5]
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from data_loader import load_data, make_source, PriceCache
+
+def _timed_load(source, cache) -> float:
+    start = time.perf_counter()
+    train_data, test_data = load_data(source=source, cache=cache)
+    # Toca nos valores para que o custo do memory-map entre na medida
+    float(np.asarray(train_data).sum() + np.asarray(test_data).sum())
+    return time.perf_counter() - start
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--source', choices=['yfinance', 'local', 'synthetic'], default='synthetic')
+    parser.add_argument('--prices-file', default=None)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output', default='results/benchmarks/data_loading.json')
+    args = parser.parse_args()
+
+    source = make_source(args.source, args.prices_file)
+    cold, warm = [], []
+    for _ in range(args.repeats):
+        directory = tempfile.mkdtemp(prefix='price_cache_')
+        try:
+            cache = PriceCache(directory)
+            cold.append(_timed_load(source, cache))
+            warm.append(_timed_load(source, cache))
+        finally:
+            shutil.rmtree(directory)
+
+    report = {
+        'source': args.source,
+        'repeats': args.repeats,
+        'cold_seconds': {'median': float(np.median(cold)), 'min': float(np.min(cold))},
+        'warm_seconds': {'median': float(np.median(warm)), 'min': float(np.min(warm))},
+    }
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Carga fria:   {report['cold_seconds']['median'] * 1000:8.1f} ms (mediana)")
+    print(f"Carga quente: {report['warm_seconds']['median'] * 1000:8.1f} ms (mediana)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Benchmark da avaliação fora da amostra em lote: pares (carteira, janela de teste) avaliados por segundo
+por evaluation.evaluate_batch, contra avaliar cada par separadamente com np.cov sobre a janela.
+
+Uso: python -m benchmarks.evaluation [--data-source synthetic] [--n-portfolios 1000] [--window 63] [--step 5]
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from data_loader import load_data, make_source, PriceCache, get_dow_jones_tickers
+from evaluation import WindowMoments, evaluate_batch, rolling_windows
+from utils import calculate_daily_returns, sample_capped_simplex, portfolio_volatility, sharpe_ratio
+
+def _per_pair(weights: np.ndarray, returns: np.ndarray, windows, n_pairs: int) -> float:
+    """Pares/s avaliando um par por vez, recalculando média e covariância da janela (como a avaliação original)."""
+    start = time.perf_counter()
+    done = 0
+    for window_start, window_end in windows:
+        for w in weights:
+            rows = returns[window_start:window_end]
+            port_ret = (1 + float(rows.mean(axis=0) @ w)) ** 252 - 1
+            sharpe_ratio(port_ret, portfolio_volatility(w, np.cov(rows.T) * 252))
+            done += 1
+            if done >= n_pairs:
+                return done / (time.perf_counter() - start)
+    return done / (time.perf_counter() - start)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data-source', choices=['yfinance', 'local', 'synthetic'], default='synthetic')
+    parser.add_argument('--prices-file', default=None)
+    parser.add_argument('--n-portfolios', type=int, default=1000)
+    parser.add_argument('--window', type=int, default=63)
+    parser.add_argument('--step', type=int, default=5)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--per-pair-sample', type=int, default=2000, help="Pares medidos no caminho um a um")
+    parser.add_argument('--output', default='results/benchmarks/evaluation.json')
+    args = parser.parse_args()
+
+    _, test_data = load_data(source=make_source(args.data_source, args.prices_file), cache=PriceCache())
+    tickers = [t for t in get_dow_jones_tickers() if t in test_data.columns]
+    returns = calculate_daily_returns(test_data[tickers])
+    windows = rolling_windows(len(returns), args.window, args.step)
+    weights = sample_capped_simplex(len(tickers), args.n_portfolios, np.random.default_rng(0), max_weight=0.2)
+    n_pairs = len(windows) * len(weights)
+
+    start = time.perf_counter()
+    for _ in range(args.repeats):
+        means, covariances = WindowMoments(returns).window_statistics(windows)
+        evaluate_batch(weights, means, covariances)
+    batch_rate = n_pairs * args.repeats / (time.perf_counter() - start)
+
+    report = {
+        'n_portfolios': len(weights),
+        'n_windows': len(windows),
+        'pairs': n_pairs,
+        'pairs_per_second': {
+            'batch': batch_rate,
+            'per_pair': _per_pair(weights, returns, windows, args.per_pair_sample),
+        },
+    }
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"{len(weights)} carteiras x {len(windows)} janelas = {n_pairs} pares")
+    for name, rate in report['pairs_per_second'].items():
+        print(f"{name:>10}: {rate:14.0f} pares/s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Compara o custo de IPC por tarefa entre enviar o DataFrame/estatísticas em cada tarefa
+e anexar os dados uma única vez via memória compartilhada ou .npy mapeado.
+
+Uso: python -m benchmarks.ipc [--data-source synthetic] [--n-tasks 600] [--processes 6] [--chunk-size 1]
+"""
+import argparse
+import json
+import logging
+import os
+import pickle
+import time
+from multiprocessing import Pool
+
+from data_loader import load_data, make_source, PriceCache
+from main import run_simulation
+from combinatorics import unrank_combination, rank_ranges
+from shared_data import publish_statistics, release_statistics
+from worker import init_worker, run_attached_range
+from utils import combination_rng, compute_return_statistics
+
+def _bytes_per_task(task) -> int:
+    return len(pickle.dumps(task, protocol=pickle.HIGHEST_PROTOCOL))
+
+def _tasks_per_second(n_tasks: int, processes: int, func, tasks, initializer=None, initargs=()) -> float:
+    start = time.perf_counter()
+    with Pool(processes=processes, maxtasksperchild=100, initializer=initializer, initargs=initargs) as pool:
+        for _ in pool.imap_unordered(func, tasks):
+            pass
+    return n_tasks / (time.perf_counter() - start)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--n-tasks', type=int, default=600)
+    parser.add_argument('--processes', type=int, default=6)
+    parser.add_argument('--chunk-size', type=int, default=1,
+                        help="Combinações por tarefa nos modos shared/mmap (1 compara tarefa a tarefa com o modo antigo)")
+    parser.add_argument('--data-source', choices=['yfinance', 'local', 'synthetic'], default='yfinance')
+    parser.add_argument('--prices-file', default=None)
+    parser.add_argument('--output', default='results/benchmarks/ipc.json')
+    args = parser.parse_args()
+
+    train_data, _ = load_data(source=make_source(args.data_source, args.prices_file), cache=PriceCache())
+    train_stats = compute_return_statistics(train_data)
+    tickers = list(train_stats.tickers)
+    combinations = [tuple(tickers[i] for i in unrank_combination(rank, len(tickers), 25)) for rank in range(args.n_tasks)]
+    # Mesmo formato de tarefa de main.run_simulation: (tickers, dados, fila, gerador, simulações, amostrador)
+    task_options = (1000, 'random')
+    n_tasks = len(combinations)
+
+    report = {'n_tasks': n_tasks, 'processes': args.processes, 'modes': {}}
+
+    dataframe_tasks = [(combo, train_data, None, combination_rng(0, rank)) + task_options for rank, combo in enumerate(combinations)]
+    report['modes']['dataframe'] = {
+        'bytes_per_task': _bytes_per_task(dataframe_tasks[0]),
+        'tasks_per_second': _tasks_per_second(n_tasks, args.processes, run_simulation, dataframe_tasks),
+    }
+
+    stats_tasks = [(combo, train_stats, None, combination_rng(0, rank)) + task_options for rank, combo in enumerate(combinations)]
+    report['modes']['statistics'] = {
+        'bytes_per_task': _bytes_per_task(stats_tasks[0]),
+        'tasks_per_second': _tasks_per_second(n_tasks, args.processes, run_simulation, stats_tasks),
+    }
+
+    ranges = [(start, count, 0.0) for start, count in rank_ranges(0, n_tasks, args.chunk_size)]
+    for backend in ('shared', 'mmap'):
+        handles, spec = publish_statistics(train_stats, backend=backend)
+        try:
+            elapsed_rate = _tasks_per_second(len(ranges), args.processes, run_attached_range, ranges, init_worker, (spec, 0, 25))
+            report['modes'][backend] = {
+                'bytes_per_task': _bytes_per_task(ranges[0]),
+                'bytes_per_worker_start': _bytes_per_task((spec, 0, 25)),
+                'combinations_per_task': args.chunk_size,
+                'tasks_per_second': elapsed_rate,
+            }
+        finally:
+            release_statistics(handles)
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    for mode, values in report['modes'].items():
+        print(f"{mode:>10}: {values['bytes_per_task']:>9} bytes/tarefa, {values['tasks_per_second']:8.1f} tarefas/s")
+    logging.info(f"Benchmark de IPC salvo em {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark de convergência do sorteio de pesos: melhor Sharpe por combinação em função do número de carteiras
+sorteadas, com o amostrador pseudoaleatório (random) e o quase-aleatório (qmc, Halton embaralhada).
+
+As combinações são fixas (ranks espaçados uniformemente no espaço completo) e cada uma é
+comparada também com o máximo Sharpe exato (optimizer.max_sharpe_weights), para medir a
+distância relativa até o ótimo. O relatório indica quantas carteiras cada amostrador precisa
+para igualar a qualidade do random com --reference carteiras (o padrão de main.py).
+
+Uso: python -m benchmarks.sampling [--n-combinations 200] [--counts 63 125 250 500 1000 2000] [--repeats 3]
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from combinatorics import n_combinations, unrank_combination
+from data_loader import load_data, make_source, PriceCache, get_dow_jones_tickers
+from optimizer import max_sharpe_weights
+from utils import WEIGHT_SAMPLERS, batch_sharpe_from_moments, combination_rng, compute_return_statistics, subset_statistics
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data-source', choices=['yfinance', 'local', 'synthetic'], default='synthetic')
+    parser.add_argument('--prices-file', default=None)
+    parser.add_argument('--n-combinations', type=int, default=200)
+    parser.add_argument('--combination-size', type=int, default=25)
+    parser.add_argument('--counts', nargs='+', type=int, default=[63, 125, 250, 500, 1000, 2000])
+    parser.add_argument('--reference', type=int, default=1000, help="Carteiras do random usadas como qualidade de referência")
+    parser.add_argument('--repeats', type=int, default=3, help="Sementes por combinação")
+    parser.add_argument('--output', default='results/benchmarks/sampling.json')
+    args = parser.parse_args()
+
+    train_data, _ = load_data(source=make_source(args.data_source, args.prices_file), cache=PriceCache())
+    tickers = [t for t in get_dow_jones_tickers() if t in train_data.columns]
+    stats = compute_return_statistics(train_data[tickers])
+    k = args.combination_size
+    ranks = np.linspace(0, n_combinations(len(tickers), k) - 1, args.n_combinations).astype(int)
+    moments = [subset_statistics(stats, np.array(unrank_combination(int(r), len(tickers), k))) for r in ranks]
+    optimum = np.array([max_sharpe_weights(mean, cov)[1] for mean, cov in moments])
+
+    counts = sorted(set(args.counts) | {args.reference})
+    report = {'n_combinations': len(ranks), 'combination_size': k, 'repeats': args.repeats,
+              'reference': args.reference, 'samplers': {}}
+    for name, sample in WEIGHT_SAMPLERS.items():
+        curve = []
+        for count in counts:
+            best = np.empty((args.repeats, len(ranks)))
+            start = time.perf_counter()
+            for seed in range(args.repeats):
+                for i, (rank, (mean, cov)) in enumerate(zip(ranks, moments)):
+                    best[seed, i] = batch_sharpe_from_moments(sample(k, count, combination_rng(seed, int(rank))), mean, cov).max()
+            seconds = time.perf_counter() - start
+            curve.append({
+                'n_simulations': count,
+                'mean_best_sharpe': float(best.mean()),
+                'mean_gap_to_optimum': float((1 - best / optimum).mean()),
+                'ms_per_combination': 1e3 * seconds / best.size,
+            })
+        report['samplers'][name] = curve
+
+    reference_gap = next(p['mean_gap_to_optimum'] for p in report['samplers']['random'] if p['n_simulations'] == args.reference)
+    report['samples_for_reference_quality'] = {
+        name: next((p['n_simulations'] for p in curve if p['mean_gap_to_optimum'] <= reference_gap), None)
+        for name, curve in report['samplers'].items()
+    }
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{len(ranks)} combinações x {args.repeats} sementes; Sharpe ótimo médio {optimum.mean():.4f}")
+    print(f"{'carteiras':>10} " + " ".join(f"{name + ' (Sharpe, distância, ms)':>36}" for name in WEIGHT_SAMPLERS))
+    for i, count in enumerate(counts):
+        cells = [report['samplers'][name][i] for name in WEIGHT_SAMPLERS]
+        print(f"{count:>10} " + " ".join(f"{c['mean_best_sharpe']:14.4f} {100 * c['mean_gap_to_optimum']:9.2f}% {c['ms_per_combination']:9.3f}" for c in cells))
+    for name, needed in report['samples_for_reference_quality'].items():
+        print(f"{name}: {needed or f'mais de {counts[-1]}'} carteiras para igualar random com {args.reference}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Benchmark de inicialização dos workers: latência da criação do Pool até o resultado da primeira tarefa,
+por método de início (fork, spawn, forkserver), e custo por tarefa quando maxtasksperchild=1
+recicla o worker a cada tarefa.
+
+A variante `legacy` faz cada worker importar também pandas, tqdm, data_loader e plot_results
+(matplotlib/seaborn), como acontecia quando main.py os importava no nível superior; a variante
+`lean` usa apenas o módulo worker. Com fork, os módulos já carregados no processo principal
+são herdados sem custo e aparecem na lista de módulos do worker.
+
+Uso: python -m benchmarks.startup [--methods fork spawn forkserver] [--processes 6] [--trials 5]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+from shared_data import publish_statistics, release_statistics
+from worker import init_worker, run_attached_range
+
+HEAVY_MODULES = ('pandas', 'matplotlib', 'seaborn', 'tqdm', 'yfinance')
+
+def _legacy_init(*initargs) -> None:
+    import pandas  # noqa: F401
+    import tqdm  # noqa: F401
+    import data_loader  # noqa: F401
+    import plot_results  # noqa: F401
+    init_worker(*initargs)
+
+def _loaded_heavy_modules(_=None) -> list:
+    return sorted(name for name in HEAVY_MODULES if name in sys.modules)
+
+def _first_task_seconds(context, processes: int, initializer, initargs) -> float:
+    start = time.perf_counter()
+    with context.Pool(processes=processes, initializer=initializer, initargs=initargs) as pool:
+        pool.apply(run_attached_range, ((0, 1, time.time()),))
+        return time.perf_counter() - start
+
+def _seconds_per_task(context, processes: int, initializer, initargs, n_tasks: int, maxtasksperchild) -> float:
+    with context.Pool(processes=processes, initializer=initializer, initargs=initargs, maxtasksperchild=maxtasksperchild) as pool:
+        pool.apply(run_attached_range, ((0, 1, time.time()),))
+        start = time.perf_counter()
+        for _ in pool.imap_unordered(run_attached_range, ((i, 1, time.time()) for i in range(n_tasks))):
+            pass
+        return (time.perf_counter() - start) / n_tasks
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--methods', nargs='+', choices=multiprocessing.get_all_start_methods(),
+                        default=multiprocessing.get_all_start_methods())
+    parser.add_argument('--variants', nargs='+', choices=['lean', 'legacy'], default=['lean', 'legacy'])
+    parser.add_argument('--processes', type=int, default=6)
+    parser.add_argument('--trials', type=int, default=5)
+    parser.add_argument('--n-tasks', type=int, default=60, help="Tarefas usadas para medir o custo de reciclagem")
+    parser.add_argument('--output', default='results/benchmarks/startup.json')
+    args = parser.parse_args()
+
+    # Dados carregados só no processo principal, para não pesar na importação deste módulo pelos workers
+    from data_loader import load_data, make_source, PriceCache, get_dow_jones_tickers
+    from utils import compute_return_statistics
+    train_data, _ = load_data(source=make_source('synthetic'), cache=PriceCache())
+    stats = compute_return_statistics(train_data[[t for t in get_dow_jones_tickers() if t in train_data.columns]])
+    handles, spec = publish_statistics(stats, backend='shared')
+    report = {'processes': args.processes, 'trials': args.trials, 'results': []}
+    try:
+        for method in args.methods:
+            context = multiprocessing.get_context(method)
+            for variant in args.variants:
+                initializer = init_worker if variant == 'lean' else _legacy_init
+                initargs = (spec, 0, 25)
+                first_task = [_first_task_seconds(context, args.processes, initializer, initargs) for _ in range(args.trials)]
+                with context.Pool(processes=1, initializer=initializer, initargs=initargs) as pool:
+                    loaded = pool.apply(_loaded_heavy_modules)
+                persistent = _seconds_per_task(context, args.processes, initializer, initargs, args.n_tasks, None)
+                recycled = _seconds_per_task(context, args.processes, initializer, initargs, args.n_tasks, 1)
+                result = {
+                    'start_method': method,
+                    'variant': variant,
+                    'first_task_ms': {'median': 1e3 * statistics.median(first_task), 'min': 1e3 * min(first_task)},
+                    'task_ms': {'persistent': 1e3 * persistent, 'recycled_every_task': 1e3 * recycled},
+                    'heavy_modules_in_worker': loaded,
+                }
+                report['results'].append(result)
+                print(f"{method:>10} {variant:>6}: primeira tarefa {result['first_task_ms']['median']:8.1f} ms, "
+                      f"por tarefa {result['task_ms']['persistent']:6.2f} ms (reciclando {result['task_ms']['recycled_every_task']:7.2f} ms), "
+                      f"módulos pesados no worker: {', '.join(loaded) or 'nenhum'}")
+    finally:
+        release_statistics(handles)
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
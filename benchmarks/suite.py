@@ -0,0 +1,148 @@
+"""Suíte de benchmark da busca: combinações/s e simulações/s por backend, número de workers e tamanho de lote.
+
+Para cada configuração roda aquecimento, repete as medições com perf_counter e registra média
+e intervalo de confiança de 95%. O relatório JSON (com o commit atual) permite comparar
+execuções de commits diferentes; o gráfico de escalabilidade/eficiência vai para results/plots/.
+
+Uso: python -m benchmarks.suite [--data-source synthetic] [--engines per-combination masked]
+                                [--backends serial process thread]
+                                [--workers 1 2 4] [--batch-sizes 1 10 50] [--trials 5]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool, cpu_count
+from typing import Callable, Dict, List
+
+from combinatorics import rank_ranges
+from data_loader import load_data, make_source, PriceCache, get_dow_jones_tickers
+from shared_data import publish_statistics, release_statistics
+from worker import init_worker, run_attached_range
+from engine import RANGE_ENGINES
+from utils import compute_return_statistics
+
+# Simulações por combinação usadas pela busca
+N_SIMULATIONS = 1000
+
+# Valores críticos t de Student bicaudais a 95% por graus de liberdade; entre duas entradas
+# usa-se a de menos graus de liberdade (t maior), o que mantém o intervalo conservador
+_T_CRITICAL_95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306,
+                  9: 2.262, 10: 2.228, 12: 2.179, 15: 2.131, 20: 2.086, 25: 2.060, 30: 2.042,
+                  40: 2.021, 60: 2.000, 120: 1.980}
+
+def confidence_interval(samples: List[float]) -> Dict[str, float]:
+    """Média e meia-largura do intervalo de confiança de 95% (t de Student)."""
+    mean = statistics.fmean(samples)
+    if len(samples) < 2:
+        return {'mean': mean, 'ci95': float('nan')}
+    df = len(samples) - 1
+    t = _T_CRITICAL_95[max(k for k in _T_CRITICAL_95 if k <= df)]
+    return {'mean': mean, 'ci95': t * statistics.stdev(samples) / len(samples) ** 0.5}
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconhecido'
+
+def _measure(run: Callable[[], int], warmup: int, trials: int) -> List[float]:
+    """Executa `run` (que retorna o número de combinações processadas) e devolve combinações/s por repetição."""
+    for _ in range(warmup):
+        run()
+    rates = []
+    for _ in range(trials):
+        start = time.perf_counter()
+        n_done = run()
+        rates.append(n_done / (time.perf_counter() - start))
+    return rates
+
+def _consume(results) -> int:
+    return sum(len(records) + failures for records, failures in results)
+
+def benchmark_config(backend: str, engine: str, workers: int, batch_size: int, train_stats, n_combinations: int,
+                     combination_size: int, warmup: int, trials: int) -> List[float]:
+    score_range = RANGE_ENGINES[engine]
+    ranges = list(rank_ranges(0, n_combinations, batch_size))
+    tasks = [(start, count, 0.0) for start, count in ranges]
+    if backend == 'serial':
+        return _measure(lambda: _consume(score_range(train_stats, s, c, combination_size, 0) for s, c in ranges),
+                        warmup, trials)
+    if backend == 'thread':
+        # Threads compartilham as estatísticas; o ganho vem das rotinas NumPy/BLAS que liberam o GIL
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return _measure(lambda: _consume(executor.map(lambda r: score_range(train_stats, r[0], r[1], combination_size, 0), ranges)),
+                            warmup, trials)
+    if backend == 'process':
+        handles, spec = publish_statistics(train_stats, backend='shared')
+        try:
+            with Pool(processes=workers, initializer=init_worker, initargs=(spec, 0, combination_size, engine)) as pool:
+                return _measure(lambda: sum(count for _, count, _, _, _ in pool.imap_unordered(run_attached_range, tasks)),
+                                warmup, trials)
+        finally:
+            release_statistics(handles)
+    raise ValueError(f"Backend desconhecido: {backend}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data-source', choices=['yfinance', 'local', 'synthetic'], default='synthetic')
+    parser.add_argument('--prices-file', default=None)
+    parser.add_argument('--backends', nargs='+', choices=['serial', 'process', 'thread'], default=['serial', 'process', 'thread'])
+    parser.add_argument('--engines', nargs='+', choices=sorted(RANGE_ENGINES), default=['per-combination'])
+    parser.add_argument('--workers', nargs='+', type=int, default=sorted({1, 2, 4, cpu_count()}))
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 10, 50])
+    parser.add_argument('--n-combinations', type=int, default=600)
+    parser.add_argument('--combination-size', type=int, default=25)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--trials', type=int, default=5)
+    parser.add_argument('--output', default='results/benchmarks/suite.json')
+    parser.add_argument('--plot', default='results/plots/scaling_efficiency.png')
+    args = parser.parse_args()
+
+    train_data, _ = load_data(source=make_source(args.data_source, args.prices_file), cache=PriceCache())
+    tickers = [t for t in get_dow_jones_tickers() if t in train_data.columns]
+    train_stats = compute_return_statistics(train_data[tickers])
+
+    report = {
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'cpu_count': cpu_count(),
+        'n_combinations': args.n_combinations,
+        'combination_size': args.combination_size,
+        'n_simulations': N_SIMULATIONS,
+        'trials': args.trials,
+        'results': [],
+    }
+    for engine in args.engines:
+        for backend in args.backends:
+            for workers in ([1] if backend == 'serial' else args.workers):
+                for batch_size in args.batch_sizes:
+                    rates = benchmark_config(backend, engine, workers, batch_size, train_stats, args.n_combinations,
+                                             args.combination_size, args.warmup, args.trials)
+                    combos = confidence_interval(rates)
+                    report['results'].append({
+                        'engine': engine,
+                        'backend': backend,
+                        'workers': workers,
+                        'batch_size': batch_size,
+                        'combinations_per_second': combos,
+                        'simulations_per_second': {k: v * N_SIMULATIONS for k, v in combos.items()},
+                    })
+                    print(f"{engine:>15} {backend:>8} workers={workers:<3} lote={batch_size:<4} "
+                          f"{combos['mean']:10.1f} ± {combos['ci95']:.1f} combinações/s")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    logging.info(f"Relatório de benchmark salvo em {args.output}")
+
+    from plot_results import plot_scaling_efficiency
+    plot_scaling_efficiency(report, args.plot)
+
+if __name__ == '__main__':
+    main()
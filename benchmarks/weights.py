@@ -0,0 +1,50 @@
+"""Microbenchmark do sorteio de pesos: vetores gerados por segundo pelo laço de rejeição
+original (utils.generate_random_weights) e pelo sorteio em lote no simplex limitado
+(utils.sample_capped_simplex).
+
+Uso: python -m benchmarks.weights [--n-tickers 25] [--n-simulations 1000] [--repeats 20]
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from utils import generate_random_weights, sample_capped_simplex
+
+def _vectors_per_second(func, n_simulations: int, repeats: int) -> float:
+    func()  # aquecimento
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return n_simulations * repeats / (time.perf_counter() - start)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--n-tickers', type=int, default=25)
+    parser.add_argument('--n-simulations', type=int, default=1000)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--output', default='results/benchmarks/weights.json')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    report = {
+        'n_tickers': args.n_tickers,
+        'n_simulations': args.n_simulations,
+        'vectors_per_second': {
+            'generate_random_weights': _vectors_per_second(
+                lambda: generate_random_weights(args.n_tickers, args.n_simulations), args.n_simulations, args.repeats),
+            'sample_capped_simplex': _vectors_per_second(
+                lambda: sample_capped_simplex(args.n_tickers, args.n_simulations, rng), args.n_simulations, args.repeats),
+        },
+    }
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    for name, rate in report['vectors_per_second'].items():
+        print(f"{name:>24}: {rate:12.0f} vetores/s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+import logging
+import math
+import time
+import numpy as np
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from checkpoint import pending_ranges
+from collector import ResultCollector
+from optimizer import projected_ascent
+from utils import ReturnStatistics, subset_statistics
+
+def _linear_extremes(values: np.ndarray, max_weight: float) -> Tuple[float, float]:
+    """Mínimo e máximo de values @ w no simplex limitado (enche até o teto os menores/maiores valores)."""
+    ordered = np.sort(values)
+    weights = np.zeros(len(values))
+    n_full = min(int(math.floor(1.0 / max_weight + 1e-12)), len(values))
+    weights[:n_full] = max_weight
+    if n_full < len(values):
+        weights[n_full] = 1.0 - n_full * max_weight
+    return float(ordered @ weights), float(ordered[::-1] @ weights)
+
+def _linearized_bound(mean_returns: np.ndarray, cov_matrix: np.ndarray, c: np.ndarray, max_weight: float) -> float:
+    """Limite superior de c @ w / vol(w) sobre o simplex limitado, certificado por um ponto dual."""
+    n = len(mean_returns)
+
+    def objective(w):
+        cov_w = cov_matrix @ w
+        volatility = math.sqrt(max(float(w @ cov_w), 1e-300))
+        ratio = float(c @ w) / volatility
+        return ratio, c / volatility - ratio * cov_w / volatility ** 2
+
+    w, _, _ = projected_ascent(objective, np.full(n, 1.0 / n), max_weight, max_iter=100, tol=1e-8)
+    volatility = math.sqrt(max(float(w @ cov_matrix @ w), 1e-300))
+    gradient = objective(w)[1]
+    # Multiplicadores das restrições w >= 0 (alpha) e w <= max_weight * sum(w) (beta) estimados da solução
+    at_cap = w >= max_weight - 1e-9
+    at_zero = w <= 1e-12
+    interior = ~at_cap & ~at_zero
+    level = float(np.median(gradient[interior])) if interior.any() else float(gradient.mean())
+    alpha = np.where(at_zero, np.maximum(level - gradient, 0.0), 0.0)
+    beta = np.where(at_cap, np.maximum(gradient - level, 0.0), 0.0)
+    # lambda = alpha - beta + max_weight * sum(beta) pertence ao cone dual para quaisquer alpha, beta >= 0
+    dual = c + volatility * (alpha - beta + max_weight * beta.sum())
+    try:
+        solved = np.linalg.solve(cov_matrix, dual)
+    except np.linalg.LinAlgError:
+        return np.inf
+    value = float(dual @ solved)
+    if not np.isfinite(value) or value < 0:
+        return np.inf
+    return math.sqrt(value)
+
+def sharpe_upper_bound(mean_returns: np.ndarray, cov_matrix: np.ndarray, max_weight: float = 0.2, risk_free_rate: float = 0.02, n_pieces: int = 4, stop_above: float = np.inf) -> float:
+    """Limite superior garantido do Sharpe de qualquer carteira do simplex limitado sobre estes tickers.
+
+    O retorno anualizado g(m) = (1 + m)^252 - 1 é convexo no retorno diário m, então, em cada
+    um dos n_pieces trechos da faixa de m atingível, fica abaixo da corda do trecho; como
+    sum(w) = 1, o numerador vira c @ w, linear em w. Toda carteira cai em algum trecho, logo o
+    maior dos limites lineares vale para todas. Cada limite linear usa a dualidade
+    c @ w <= (c + lambda) @ w <= ||C^(-1/2) (c + lambda)|| * vol(w), com lambda no cone dual
+    das restrições estimado da solução aproximada: o limite é justo, mas continua válido
+    mesmo que essa solução não seja exata. Devolve inf se a covariância for singular.
+
+    Os trechos são avaliados do maior retorno para o menor e a função retorna assim que um
+    limite passa de `stop_above`, já que aí a família não pode ser descartada.
+    """
+    m_low, m_high = _linear_extremes(mean_returns, max_weight)
+    if m_high <= m_low:
+        return _linearized_bound(mean_returns, cov_matrix, np.full(len(mean_returns), (1 + m_low) ** 252 - 1 - risk_free_rate), max_weight)
+    bound = -np.inf
+    edges = np.linspace(m_low, m_high, n_pieces + 1)
+    for lo, hi in zip(edges[-2::-1], edges[:0:-1]):
+        g_lo, g_hi = (1 + lo) ** 252 - 1, (1 + hi) ** 252 - 1
+        slope = (g_hi - g_lo) / (hi - lo)
+        c = slope * mean_returns + (g_lo - slope * lo - risk_free_rate)
+        bound = max(bound, _linearized_bound(mean_returns, cov_matrix, c, max_weight))
+        if bound >= stop_above:
+            break
+    return bound
+
+class BranchAndBound:
+    """Busca no reticulado de combinações descartando famílias inteiras que não alcançam o top-K.
+
+    Uma família é o conjunto de combinações (em ordem lexicográfica) que começam com o mesmo
+    prefixo de índices; ela ocupa um intervalo contíguo de ranks, e toda combinação dela é um
+    subconjunto do prefixo mais os índices após o último. O Sharpe de qualquer carteira da
+    família é, portanto, limitado por sharpe_upper_bound sobre esse superconjunto; se o limite
+    fica abaixo do menor Sharpe do top-K, o intervalo todo é pulado. Famílias com até
+    leaf_size combinações são avaliadas diretamente pelo motor escolhido, então o top-K final
+    é o mesmo da busca exaustiva (as estatísticas agregadas cobrem só o que foi avaliado).
+    """
+
+    def __init__(self, stats: ReturnStatistics, combination_size: int, collector: ResultCollector, leaf_size: int = 50, max_weight: float = 0.2, risk_free_rate: float = 0.02):
+        self.stats = stats
+        self.n_tickers = len(stats.tickers)
+        self.combination_size = combination_size
+        self.collector = collector
+        self.leaf_size = leaf_size
+        self.max_weight = max_weight
+        self.risk_free_rate = risk_free_rate
+        self.bounds_computed = 0
+        self.bound_seconds = 0.0
+        self.pruned_families = 0
+        self.pruned_combinations = 0
+        self.evaluated_combinations = 0
+
+    def family_bound(self, superset: Sequence[int]) -> float:
+        """Limite superior do Sharpe das combinações contidas em `superset` (índices dos tickers)."""
+        start = time.perf_counter()
+        mean_returns, cov_matrix = subset_statistics(self.stats, np.asarray(superset, dtype=np.intp))
+        # Com 1e-9 de folga para que arredondamentos nunca descartem um empate com o limiar
+        bound = sharpe_upper_bound(mean_returns, cov_matrix, self.max_weight, self.risk_free_rate,
+                                   stop_above=self.collector.threshold) * (1 + 1e-9)
+        self.bounds_computed += 1
+        self.bound_seconds += time.perf_counter() - start
+        return bound
+
+    def ranges(self, start: int, stop: int, chunk_size: int, completed: List[Tuple[int, int]] = (), on_prune: Optional[Callable[[int, int], None]] = None) -> Iterator[Tuple[int, int]]:
+        """Gera, sob demanda, os intervalos (start_rank, count) de [start, stop) que precisam ser avaliados.
+
+        O limiar do top-K é lido do coletor a cada família, então o chamador deve agregar os
+        resultados já avaliados antes de pedir o próximo intervalo. Intervalos em `completed`
+        são pulados; os descartados são informados a `on_prune(start_rank, count)`.
+        """
+        n, k = self.n_tickers, self.combination_size
+        # Pilha de famílias (rank inicial, prefixo); filhos empilhados em ordem inversa para sair em ordem lexicográfica
+        stack = [(0, ())]
+        while stack:
+            family_start, prefix = stack.pop()
+            last = prefix[-1] if prefix else -1
+            family_count = math.comb(n - last - 1, k - len(prefix))
+            lo, hi = max(family_start, start), min(family_start + family_count, stop)
+            if lo >= hi:
+                continue
+            pending = list(pending_ranges(lo, hi, hi - lo, list(completed)))
+            if not pending:
+                continue
+            if family_count <= self.leaf_size or len(prefix) == k:
+                for pending_start, pending_count in pending:
+                    self.evaluated_combinations += pending_count
+                    yield from pending_ranges(pending_start, pending_start + pending_count, chunk_size, [])
+                continue
+            if self.collector.threshold > -np.inf and self.family_bound(prefix + tuple(range(last + 1, n))) < self.collector.threshold:
+                self.pruned_families += 1
+                for pending_start, pending_count in pending:
+                    self.pruned_combinations += pending_count
+                    if on_prune is not None:
+                        on_prune(pending_start, pending_count)
+                continue
+            children = []
+            child_start = family_start
+            for index in range(last + 1, n - (k - len(prefix)) + 1):
+                children.append((child_start, prefix + (index,)))
+                child_start += math.comb(n - index - 1, k - len(prefix) - 1)
+            stack.extend(reversed(children))
+
+    def summary(self) -> Dict[str, float]:
+        seen = self.pruned_combinations + self.evaluated_combinations
+        return {
+            'evaluated_combinations': self.evaluated_combinations,
+            'pruned_combinations': self.pruned_combinations,
+            'pruned_fraction': self.pruned_combinations / seen if seen else 0.0,
+            'pruned_families': self.pruned_families,
+            'bounds_computed': self.bounds_computed,
+            'bound_seconds': self.bound_seconds,
+        }
+
+    def log_summary(self) -> None:
+        summary = self.summary()
+        logging.warning("Branch-and-bound: %d combinações avaliadas, %d descartadas (%.1f%%) em %d famílias; "
+                        "%d limites calculados em %.2fs",
+                        summary['evaluated_combinations'], summary['pruned_combinations'], 100 * summary['pruned_fraction'],
+                        summary['pruned_families'], summary['bounds_computed'], summary['bound_seconds'])
@@ -0,0 +1,148 @@
+import glob
+import json
+import logging
+import os
+import time
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Tuple
+from collector import result_dtype
+
+MANIFEST_NAME = 'manifest.json'
+
+def merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Une intervalos (start, count) sobrepostos ou adjacentes, em ordem crescente."""
+    merged = []
+    for start, count in sorted(ranges):
+        if merged and start <= merged[-1][0] + merged[-1][1]:
+            last_start, last_count = merged[-1]
+            merged[-1] = (last_start, max(last_start + last_count, start + count) - last_start)
+        else:
+            merged.append((start, count))
+    return merged
+
+def pending_ranges(start: int, stop: int, chunk_size: int, completed: List[Tuple[int, int]]) -> Iterator[Tuple[int, int]]:
+    """Intervalos (start_rank, count) de [start, stop) que ainda não aparecem em `completed`."""
+    cursor = start
+    for done_start, done_count in merge_ranges(completed) + [(stop, 0)]:
+        gap_stop = min(done_start, stop)
+        for chunk_start in range(cursor, gap_stop, chunk_size):
+            yield chunk_start, min(chunk_size, gap_stop - chunk_start)
+        cursor = max(cursor, done_start + done_count)
+        if cursor >= stop:
+            return
+
+class CheckpointStore:
+    """Armazena os resultados da busca em shards .npy só de acréscimo, com um manifesto dos intervalos concluídos.
+
+    Os blocos recebidos ficam em memória até somarem flush_every registros (ou flush_interval
+    segundos); então um shard novo é gravado e o manifesto é substituído atomicamente. Um
+    intervalo só entra no manifesto junto com o shard que contém seus registros, então uma
+    interrupção perde no máximo o buffer ainda não gravado.
+    """
+
+    def __init__(self, directory: str, config: Dict, flush_every: int = 20000, flush_interval: float = 30.0):
+        self.directory = directory
+        self.config = config
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._dtype = result_dtype(config['combination_size'])
+        self._shards = []
+        self._buffer = []
+        self._buffer_ranges = []
+        self._buffer_failures = 0
+        self._buffer_size = 0
+        self._last_flush = time.perf_counter()
+        self.complete = False
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, MANIFEST_NAME)
+
+    @staticmethod
+    def read_config(directory: str) -> Optional[Dict]:
+        """Configuração gravada no manifesto de um checkpoint existente, ou None."""
+        path = os.path.join(directory, MANIFEST_NAME)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)['config']
+
+    def start(self, resume: bool, overwrite: bool = False) -> None:
+        """Abre o checkpoint: retoma o existente (resume=True) ou começa um novo, descartando o anterior.
+
+        Só os arquivos do próprio checkpoint (manifesto e shards) são removidos, nunca o diretório.
+        Um checkpoint inacabado (sem mark_complete) com outra configuração só é descartado com
+        overwrite=True; um concluído é substituído normalmente.
+        """
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            same_config = manifest['config'] == self.config
+            if resume and same_config:
+                self._shards = manifest['shards']
+                logging.warning(f"Retomando checkpoint com {len(self._shards)} shards em {self.directory}")
+                return
+            unfinished = manifest['shards'] and not manifest.get('complete', False)
+            if not same_config and (resume or (unfinished and not overwrite)):
+                logging.error(f"Checkpoint incompatível: {manifest['config']} != {self.config}")
+                raise ValueError(f"O checkpoint em {self.directory} tem outra configuração e não foi concluído; "
+                                 f"use --resume com a mesma configuração, outro --checkpoint-dir ou "
+                                 f"--overwrite-checkpoint para descartá-lo")
+            logging.warning(f"Descartando checkpoint anterior em {self.directory} ({len(manifest['shards'])} shards)")
+        for path in glob.glob(os.path.join(self.directory, 'shard_*.npy*')) + glob.glob(self.manifest_path + '*'):
+            os.remove(path)
+        os.makedirs(self.directory, exist_ok=True)
+        self._write_manifest()
+
+    def completed_ranges(self) -> List[Tuple[int, int]]:
+        return merge_ranges([tuple(r) for shard in self._shards for r in shard['ranges']])
+
+    def completed_failures(self) -> int:
+        return sum(shard['failures'] for shard in self._shards)
+
+    def iter_records(self) -> Iterator[np.ndarray]:
+        """Registros de cada shard já gravado (mapeados em memória)."""
+        for shard in self._shards:
+            yield np.load(os.path.join(self.directory, shard['file']), mmap_mode='r')
+
+    def add(self, start: int, count: int, records: np.ndarray, failures: int) -> None:
+        """Acrescenta o resultado de um intervalo concluído ao buffer, gravando um shard se necessário."""
+        self._buffer.append(records)
+        self._buffer_ranges.append((start, count))
+        self._buffer_failures += failures
+        self._buffer_size += len(records) + failures
+        if self._buffer_size >= self.flush_every or time.perf_counter() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Grava o buffer como um novo shard e atualiza o manifesto."""
+        self._last_flush = time.perf_counter()
+        if not self._buffer_ranges:
+            return
+        name = f"shard_{len(self._shards):06d}.npy"
+        records = np.concatenate(self._buffer) if self._buffer else np.empty(0, dtype=self._dtype)
+        tmp_path = os.path.join(self.directory, name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.save(f, records)
+        os.replace(tmp_path, os.path.join(self.directory, name))
+        self._shards.append({
+            'file': name,
+            'ranges': [list(r) for r in merge_ranges(self._buffer_ranges)],
+            'failures': self._buffer_failures,
+        })
+        self._write_manifest()
+        logging.debug(f"Shard {name} gravado com {len(records)} registros")
+        self._buffer, self._buffer_ranges = [], []
+        self._buffer_failures = self._buffer_size = 0
+
+    def mark_complete(self) -> None:
+        """Grava o buffer e registra no manifesto que todos os intervalos pedidos foram concluídos."""
+        self.flush()
+        self.complete = True
+        self._write_manifest()
+
+    def _write_manifest(self) -> None:
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'config': self.config, 'shards': self._shards, 'complete': self.complete}, f)
+        os.replace(tmp_path, self.manifest_path)
@@ -0,0 +1,239 @@
+"""Busca distribuída: um coordenador entrega intervalos de ranks a workers conectados por socket TCP ou Unix.
+
+O coordenador roda dentro de main.py (--cluster-listen) e expõe os resultados como o
+imap_unordered do Pool, então checkpoint, top-K e arquivos de saída são os mesmos. Cada
+worker recebe as estatísticas de treino uma vez na conexão e depois só intervalos
+(start_rank, count); um intervalo entregue a um worker que morre (conexão encerrada) ou
+que passa de task_timeout segundos sem responder volta para a fila e é reenviado.
+
+Workers em outras máquinas: python -m cluster worker --connect HOST:PORTA [--processes 4]
+As mensagens são pickles autenticados por HMAC com a chave compartilhada (--authkey ou a
+variável PORTFOLIO_CLUSTER_AUTHKEY): quem tem a chave pode executar código nas duas pontas.
+Sem chave, o coordenador gera uma aleatória e a registra uma vez; o worker exige a chave.
+Sem host explícito o coordenador escuta só em 127.0.0.1; exponha-o apenas em redes confiáveis.
+"""
+import argparse
+import collections
+import logging
+import multiprocessing
+import os
+import queue
+import secrets
+import socket
+import threading
+import time
+from multiprocessing.connection import Client, Connection, Listener, wait
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from engine import RANGE_ENGINES
+from utils import ReturnStatistics
+import instrumentation
+
+AUTHKEY_ENV_VAR = 'PORTFOLIO_CLUSTER_AUTHKEY'
+
+def parse_address(address: str) -> Union[str, Tuple[str, int]]:
+    """'host:porta' vira um endereço TCP (':porta' escuta só em 127.0.0.1); qualquer outra coisa é o caminho de um socket Unix."""
+    host, separator, port = address.rpartition(':')
+    if separator and port.isdigit() and '/' not in address:
+        return host or '127.0.0.1', int(port)
+    return address
+
+def resolve_authkey(authkey: Optional[str] = None) -> Optional[str]:
+    """Chave passada explicitamente ou, na falta dela, a da variável de ambiente; None se não houver nenhuma."""
+    return authkey or os.environ.get(AUTHKEY_ENV_VAR) or None
+
+def run_worker(address: str, authkey: Optional[str] = None) -> int:
+    """Conecta ao coordenador e avalia os intervalos recebidos até a ordem de parada. Retorna quantos avaliou."""
+    authkey = resolve_authkey(authkey)
+    if authkey is None:
+        raise ValueError(f"Chave do cluster ausente: use --authkey ou a variável {AUTHKEY_ENV_VAR}")
+    conn = Client(parse_address(address), authkey=authkey.encode())
+    conn.send(('hello', socket.gethostname(), os.getpid()))
+    _, stats, seed, combination_size, engine, options = conn.recv()
+    score_range = RANGE_ENGINES[engine]
+    n_ranges = 0
+    try:
+        while True:
+            message = conn.recv()
+            if message[0] == 'stop':
+                break
+            _, start, count = message
+            records, failures = score_range(stats, start, count, combination_size, seed, **options)
+            conn.send(('result', start, count, records, failures, instrumentation.worker_telemetry()))
+            n_ranges += 1
+    except EOFError:
+        logging.warning("Coordenador encerrou a conexão")
+    finally:
+        conn.close()
+    return n_ranges
+
+def run_worker_processes(address: str, processes: int, authkey: Optional[str] = None) -> None:
+    """Inicia `processes` workers locais conectados ao mesmo coordenador e espera todos terminarem."""
+    workers = [multiprocessing.Process(target=run_worker, args=(address, authkey), daemon=True) for _ in range(processes)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+
+class Coordinator:
+    """Distribui intervalos de ranks aos workers conectados e devolve os resultados à medida que chegam.
+
+    Toda a lógica de despacho roda na thread de quem itera results(): o próximo intervalo só
+    é retirado de `ranges` quando algum worker está livre, depois que o chamador processou os
+    resultados anteriores (o que o branch-and-bound precisa para ler o limiar atualizado).
+    Uma thread auxiliar apenas aceita conexões e faz o handshake.
+    """
+
+    def __init__(self, address: str, stats: ReturnStatistics, seed: int, combination_size: int, engine: str, authkey: Optional[str] = None, task_timeout: float = 600.0, n_simulations: int = 1000, sampler: str = 'random'):
+        self.address = parse_address(address)
+        self.setup = ('setup', stats, seed, combination_size, engine, {'n_simulations': n_simulations, 'sampler': sampler})
+        self.task_timeout = task_timeout
+        self.authkey = resolve_authkey(authkey)
+        if self.authkey is None:
+            self.authkey = secrets.token_hex(16)
+            logging.warning("Nenhuma chave do cluster definida; chave gerada para esta execução: %s", self.authkey)
+        self._listener = Listener(self.address, authkey=self.authkey.encode())
+        self._accepted = queue.Queue()
+        self._closing = False
+        self._names: Dict[Connection, str] = {}
+        self.reissued = 0
+        self.workers_seen = 0
+        self.local_processes: List[multiprocessing.Process] = []
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    @property
+    def listen_address(self) -> str:
+        address = self._listener.address
+        return f"{address[0]}:{address[1]}" if isinstance(address, tuple) else address
+
+    def _accept_loop(self) -> None:
+        while not self._closing:
+            try:
+                conn = self._listener.accept()
+                if not conn.poll(30):
+                    conn.close()
+                    continue
+                _, host, pid = conn.recv()
+                conn.send(self.setup)
+            except (OSError, EOFError, multiprocessing.AuthenticationError) as e:
+                if not self._closing:
+                    logging.warning("Falha ao aceitar worker: %s", e)
+                continue
+            self._accepted.put((conn, f"{host}:{pid}"))
+
+    def start_local_workers(self, n_workers: int) -> None:
+        """Inicia workers locais (processos separados) conectados a este coordenador, para testes numa só máquina."""
+        address = self.listen_address.replace('0.0.0.0', '127.0.0.1')
+        # spawn: processos limpos, como numa máquina remota, sem herdar o listener e a thread de aceite
+        context = multiprocessing.get_context('spawn')
+        for _ in range(n_workers):
+            process = context.Process(target=run_worker, args=(address, self.authkey), daemon=True)
+            process.start()
+            self.local_processes.append(process)
+
+    def wait_for_workers(self, n_workers: int, timeout: float = 120.0) -> bool:
+        """Espera até que n_workers tenham feito o handshake (sem consumi-los); útil para medir só a busca."""
+        deadline = time.perf_counter() + timeout
+        while self._accepted.qsize() < n_workers:
+            if time.perf_counter() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def results(self, ranges: Iterable[Tuple[int, int]]) -> Iterator[Tuple[int, int, object, int, Optional[dict]]]:
+        """Gera (start, count, records, failures, telemetria) de cada intervalo, como run_attached_range."""
+        ranges = iter(ranges)
+        retry = collections.deque()
+        idle: List[Connection] = []
+        in_flight: Dict[Connection, Tuple[int, int, float]] = {}
+        exhausted = False
+        last_notice = time.perf_counter()
+        try:
+            while True:
+                while not self._accepted.empty():
+                    conn, name = self._accepted.get()
+                    self._names[conn] = name
+                    self.workers_seen += 1
+                    idle.append(conn)
+                    logging.warning("Worker conectado: %s", name)
+                while idle and (retry or not exhausted):
+                    if retry:
+                        task = retry.popleft()
+                    else:
+                        try:
+                            task = next(ranges)
+                        except StopIteration:
+                            exhausted = True
+                            break
+                    conn = idle.pop()
+                    try:
+                        conn.send(('task',) + tuple(task))
+                        in_flight[conn] = (task[0], task[1], time.perf_counter())
+                    except OSError:
+                        self._drop(conn, None, retry)
+                        retry.appendleft(task)
+                if exhausted and not retry and not in_flight:
+                    return
+                if not in_flight:
+                    if time.perf_counter() - last_notice > 30:
+                        logging.warning("Aguardando workers em %s", self.listen_address)
+                        last_notice = time.perf_counter()
+                    time.sleep(0.05)
+                    continue
+                for conn in wait(list(in_flight), timeout=0.2):
+                    try:
+                        _, start, count, records, failures, telemetry = conn.recv()
+                    except (EOFError, OSError):
+                        self._drop(conn, in_flight.pop(conn), retry)
+                        continue
+                    del in_flight[conn]
+                    idle.append(conn)
+                    yield start, count, records, failures, telemetry
+                now = time.perf_counter()
+                for conn, task in list(in_flight.items()):
+                    if now - task[2] > self.task_timeout:
+                        logging.warning("Worker %s excedeu %.0fs no intervalo %s", self._names.get(conn), self.task_timeout, task[:2])
+                        del in_flight[conn]
+                        self._drop(conn, task, retry)
+        finally:
+            self.close(idle + list(in_flight))
+
+    def _drop(self, conn: Connection, task: Optional[Tuple[int, int, float]], retry: collections.deque) -> None:
+        """Descarta um worker perdido e recoloca na fila o intervalo que estava com ele."""
+        if task is not None:
+            retry.append(task[:2])
+            self.reissued += 1
+        logging.warning("Worker %s perdido%s", self._names.pop(conn, '?'),
+                        f"; intervalo {task[:2]} será reenviado" if task is not None else "")
+        try:
+            conn.close()
+        except OSError:
+            pass
+
+    def close(self, connections: Iterable[Connection] = ()) -> None:
+        """Manda os workers pararem e fecha o listener."""
+        self._closing = True
+        for conn in connections:
+            try:
+                conn.send(('stop',))
+                conn.close()
+            except OSError:
+                pass
+        self._listener.close()
+        for process in self.local_processes:
+            process.join(timeout=5)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Worker da busca distribuída")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    worker_parser = subparsers.add_parser('worker', help="Conecta ao coordenador (main.py --cluster-listen) e avalia intervalos")
+    worker_parser.add_argument('--connect', required=True, help="Endereço do coordenador: HOST:PORTA ou caminho de socket Unix")
+    worker_parser.add_argument('--processes', type=int, default=os.cpu_count())
+    worker_parser.add_argument('--authkey', default=None, help=f"Chave compartilhada com o coordenador (padrão: variável {AUTHKEY_ENV_VAR})")
+    args = parser.parse_args()
+    if resolve_authkey(args.authkey) is None:
+        parser.error(f"defina a chave do coordenador com --authkey ou a variável {AUTHKEY_ENV_VAR}")
+    run_worker_processes(args.connect, args.processes, args.authkey)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+import heapq
+import logging
+import numpy as np
+from typing import Dict, Optional
+
+def result_dtype(combination_size: int) -> np.dtype:
+    """Registro compacto de uma combinação: rank, Sharpe e pesos em float32."""
+    return np.dtype([('rank', np.int64), ('sharpe', np.float64), ('weights', np.float32, (combination_size,))])
+
+class ResultCollector:
+    """Mantém as top-K carteiras e estatísticas agregadas da busca em memória constante.
+
+    As K melhores ficam em um array estruturado pré-alocado; um heap mínimo de
+    (sharpe, -rank, slot) indica qual registro substituir quando chega um melhor. Contagem,
+    falhas, média/desvio e histograma dos Sharpe são atualizados a cada bloco recebido,
+    sem guardar os resultados individuais.
+    """
+
+    def __init__(self, top_k: int, combination_size: int, histogram_edges: Optional[np.ndarray] = None):
+        if top_k <= 0:
+            raise ValueError("top_k deve ser positivo")
+        self.top_k = top_k
+        self.combination_size = combination_size
+        self._records = np.zeros(top_k, dtype=result_dtype(combination_size))
+        self._heap = []
+        self.histogram_edges = np.linspace(-10.0, 10.0, 201) if histogram_edges is None else np.asarray(histogram_edges)
+        self.histogram = np.zeros(len(self.histogram_edges) - 1, dtype=np.int64)
+        self.count = 0
+        self.failures = 0
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self.min_sharpe = np.inf
+        self.max_sharpe = -np.inf
+
+    @property
+    def threshold(self) -> float:
+        """Menor Sharpe ainda no top-K (-inf enquanto o heap não estiver cheio)."""
+        if len(self._heap) < self.top_k:
+            return -np.inf
+        return self._heap[0][0]
+
+    def add(self, records: np.ndarray, failures: int = 0) -> None:
+        """Agrega um bloco de registros (ver result_dtype) e o número de falhas do bloco."""
+        self.failures += failures
+        if len(records) == 0:
+            return
+        sharpes = records['sharpe']
+        self.count += len(records)
+        self._sum += float(sharpes.sum())
+        self._sum_sq += float(np.square(sharpes).sum())
+        self.min_sharpe = min(self.min_sharpe, float(sharpes.min()))
+        self.max_sharpe = max(self.max_sharpe, float(sharpes.max()))
+        # Valores fora do intervalo vão para o primeiro/último bin
+        clipped = np.clip(sharpes, self.histogram_edges[0], np.nextafter(self.histogram_edges[-1], -np.inf))
+        self.histogram += np.histogram(clipped, bins=self.histogram_edges)[0]
+
+        for i in np.flatnonzero(sharpes > self.threshold):
+            key = (float(sharpes[i]), -int(records['rank'][i]))
+            if len(self._heap) < self.top_k:
+                slot = len(self._heap)
+                heapq.heappush(self._heap, key + (slot,))
+            elif key > self._heap[0][:2]:
+                slot = heapq.heapreplace(self._heap, key + (self._heap[0][2],))[2]
+            else:
+                continue
+            self._records[slot] = records[i]
+
+    def top(self) -> np.ndarray:
+        """Registros do top-K em ordem decrescente de Sharpe."""
+        slots = [slot for _, _, slot in sorted(self._heap, reverse=True)]
+        return self._records[slots]
+
+    def summary(self) -> Dict[str, float]:
+        """Estatísticas agregadas de todas as combinações recebidas."""
+        mean = self._sum / self.count if self.count else np.nan
+        variance = self._sum_sq / self.count - mean ** 2 if self.count else np.nan
+        return {
+            'count': self.count,
+            'failures': self.failures,
+            'mean_sharpe': mean,
+            'std_sharpe': float(np.sqrt(max(variance, 0.0))) if self.count else np.nan,
+            'min_sharpe': self.min_sharpe,
+            'max_sharpe': self.max_sharpe,
+        }
+
+    def quantile(self, q: float) -> float:
+        """Quantil aproximado dos Sharpe recebidos, interpolado linearmente dentro do bin do histograma."""
+        if self.count == 0:
+            return np.nan
+        cumulative = np.cumsum(self.histogram)
+        target = q * cumulative[-1]
+        b = int(np.searchsorted(cumulative, target))
+        below = cumulative[b - 1] if b > 0 else 0
+        fraction = (target - below) / self.histogram[b] if self.histogram[b] else 0.0
+        low, high = self.histogram_edges[b], self.histogram_edges[b + 1]
+        return float(low + fraction * (high - low))
+
+    def log_summary(self) -> None:
+        summary = self.summary()
+        logging.warning(f"Combinações válidas: {summary['count']}, falhas: {summary['failures']}, "
+                        f"Sharpe médio: {summary['mean_sharpe']:.4f} (desvio {summary['std_sharpe']:.4f}), "
+                        f"máximo: {summary['max_sharpe']:.4f}")
+        logging.warning("Distribuição do Sharpe (histograma): p5 %.4f, p25 %.4f, mediana %.4f, p75 %.4f, p95 %.4f",
+                        *(self.quantile(q) for q in (0.05, 0.25, 0.5, 0.75, 0.95)))
@@ -0,0 +1,75 @@
+import math
+import logging
+from typing import Iterator, Optional, Sequence, Tuple
+
+def n_combinations(n: int, k: int) -> int:
+    """Número total de combinações C(n, k)."""
+    return math.comb(n, k)
+
+def unrank_combination(rank: int, n: int, k: int) -> Tuple[int, ...]:
+    """Retorna a combinação de posição `rank` na ordem lexicográfica de itertools.combinations(range(n), k).
+
+    Usa o sistema numérico combinatório: para cada posição, pula os blocos inteiros de
+    combinações que começam com um índice menor, sem enumerá-los.
+    """
+    total = math.comb(n, k)
+    if not 0 <= rank < total:
+        logging.error(f"Rank {rank} fora do intervalo [0, {total})")
+        raise ValueError(f"Rank fora do intervalo: {rank}")
+    combination = []
+    candidate = 0
+    for position in range(k):
+        while True:
+            block = math.comb(n - candidate - 1, k - position - 1)
+            if rank < block:
+                break
+            rank -= block
+            candidate += 1
+        combination.append(candidate)
+        candidate += 1
+    return tuple(combination)
+
+def rank_combination(combination: Sequence[int], n: int) -> int:
+    """Inverso de unrank_combination: posição lexicográfica de uma combinação de índices crescentes."""
+    k = len(combination)
+    rank = 0
+    previous = -1
+    for position, index in enumerate(combination):
+        for skipped in range(previous + 1, index):
+            rank += math.comb(n - skipped - 1, k - position - 1)
+        previous = index
+    return rank
+
+def next_combination(combination: Tuple[int, ...], n: int) -> Optional[Tuple[int, ...]]:
+    """Sucessora lexicográfica de uma combinação, ou None se ela for a última."""
+    k = len(combination)
+    values = list(combination)
+    for position in reversed(range(k)):
+        if values[position] < n - k + position:
+            values[position] += 1
+            for following in range(position + 1, k):
+                values[following] = values[following - 1] + 1
+            return tuple(values)
+    return None
+
+def iter_combination_range(start: int, count: int, n: int, k: int) -> Iterator[Tuple[int, ...]]:
+    """Gera, sob demanda, as combinações de ranks [start, start + count).
+
+    Só a primeira é obtida por unrank; as seguintes saem da sucessora, então a memória é
+    constante qualquer que seja o tamanho do intervalo.
+    """
+    if count <= 0:
+        return
+    combination = unrank_combination(start, n, k)
+    for _ in range(count):
+        yield combination
+        combination = next_combination(combination, n)
+        if combination is None:
+            return
+
+def rank_ranges(start: int, stop: int, chunk_size: int) -> Iterator[Tuple[int, int]]:
+    """Divide os ranks [start, stop) em intervalos (start_rank, count) de até chunk_size combinações."""
+    if chunk_size <= 0:
+        raise ValueError("chunk_size deve ser positivo")
+    for chunk_start in range(start, stop, chunk_size):
+        yield chunk_start, min(chunk_size, stop - chunk_start)
@@ -1,8 +1,17 @@
-import yfinance as yf
+import hashlib
+import json
+from abc import ABC, abstractmethod
+import os
+import time
+import zlib
+import numpy as np
 import pandas as pd
-from typing import Tuple
+from typing import List, Optional, Tuple
 import logging
 
+TRAIN_PERIOD = ('2024-08-01', '2024-12-31')
+TEST_PERIOD = ('2023-01-01', '2024-03-31')
+
 def get_dow_jones_tickers() -> list:
     """Retorna a lista de tickers do Dow Jones."""
     logging.debug("Obtendo lista de tickers do Dow Jones")
@@ -14,48 +23,189 @@ def get_dow_jones_tickers() -> list:
     logging.info(f"Tickers obtidos: {len(tickers)} empresas")
     return tickers
 
-def download_data(tickers: list, start_date: str, end_date: str) -> pd.DataFrame:
-    """Baixa dados de preços ajustados das ações via yfinance."""
-    logging.debug(f"Baixando dados de {start_date} a {end_date}")
-    try:
+def _drop_incomplete_tickers(data: pd.DataFrame) -> pd.DataFrame:
+    initial_columns = data.columns
+    data = data.dropna(axis=1, how='any')
+    if data.empty:
+        logging.error("Todos os dados foram removidos após dropna")
+        raise ValueError("Nenhum dado válido após remover NaN")
+
+    dropped_columns = [col for col in initial_columns if col not in data.columns]
+    if dropped_columns:
+        logging.warning(f"Ações removidas devido a dados ausentes: {dropped_columns}")
+    return data
+
+class PriceSource(ABC):
+    """Interface das fontes de preços: retorna um DataFrame (datas x tickers) de preços de fechamento."""
+    name = 'base'
+
+    @abstractmethod
+    def fetch(self, tickers: List[str], start_date: str, end_date: str, price_field: str = 'Adj Close') -> pd.DataFrame:
+        """Preços de `tickers` em [start_date, end_date), uma coluna por ticker."""
+
+    def cache_id(self) -> str:
+        """Identifica a fonte (e seus parâmetros) na chave do cache."""
+        return self.name
+
+class YFinanceSource(PriceSource):
+    """Baixa os preços pela API do yfinance (requer rede)."""
+    name = 'yfinance'
+
+    def fetch(self, tickers: List[str], start_date: str, end_date: str, price_field: str = 'Adj Close') -> pd.DataFrame:
+        # Importado aqui para que ambientes sem rede/yfinance possam usar as outras fontes
+        import yfinance as yf
         data = yf.download(tickers, start=start_date, end=end_date, progress=False, auto_adjust=False)
         if data.empty:
             logging.error(f"Nenhum dado retornado para {start_date} a {end_date}")
             raise ValueError("Nenhum dado retornado pela API yfinance")
-        
-        if isinstance(data, pd.DataFrame) and 'Adj Close' in data.columns:
-            data = data['Adj Close']
+
+        if isinstance(data, pd.DataFrame) and price_field in data.columns:
+            data = data[price_field]
         elif isinstance(data, pd.DataFrame) and data.columns.nlevels > 1:
-            data = data.xs('Adj Close', level=1, axis=1)
+            data = data.xs(price_field, level=1, axis=1)
         else:
-            logging.error("Coluna 'Adj Close' não encontrada")
-            raise ValueError("Coluna 'Adj Close' não encontrada")
-        
-        initial_columns = data.columns
-        data = data.dropna(axis=1, how='any')
-        if data.empty:
-            logging.error("Todos os dados foram removidos após dropna")
-            raise ValueError("Nenhum dado válido após remover NaN")
-        
-        dropped_columns = [col for col in initial_columns if col not in data.columns]
-        if dropped_columns:
-            logging.warning(f"Ações removidas devido a dados ausentes: {dropped_columns}")
-        
-        logging.info(f"Dados baixados: {data.shape[0]} dias, {data.shape[1]} ações")
+            logging.error(f"Coluna '{price_field}' não encontrada")
+            raise ValueError(f"Coluna '{price_field}' não encontrada")
+        return data
+
+class LocalFileSource(PriceSource):
+    """Lê preços de um arquivo local (.csv ou .parquet) com datas no índice e um ticker por coluna."""
+    name = 'local'
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def cache_id(self) -> str:
+        stat = os.stat(self.path)
+        return f"{self.name}:{os.path.abspath(self.path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def fetch(self, tickers: List[str], start_date: str, end_date: str, price_field: str = 'Adj Close') -> pd.DataFrame:
+        if self.path.endswith('.parquet'):
+            data = pd.read_parquet(self.path)
+        else:
+            data = pd.read_csv(self.path, index_col=0, parse_dates=True)
+        missing_tickers = [t for t in tickers if t not in data.columns]
+        if missing_tickers:
+            logging.warning(f"Tickers ausentes em {self.path}: {missing_tickers}")
+        data = data.sort_index()
+        # Mesma convenção do yfinance: data final exclusiva
+        return data.loc[(data.index >= start_date) & (data.index < end_date), [t for t in tickers if t in data.columns]]
+
+class SyntheticSource(PriceSource):
+    """Gera preços determinísticos (movimento browniano geométrico com fator de mercado) para testes offline.
+
+    As séries são geradas num calendário fixo de dias úteis a partir de EPOCH e depois recortadas
+    em [start_date, end_date): o preço de cada data depende apenas da semente e do ticker, não
+    do período nem do conjunto de tickers pedido, então períodos distintos não se repetem.
+    """
+    name = 'synthetic'
+    EPOCH = '2015-01-01'
+
+    def __init__(self, seed: int = 0):
+        self.seed = seed
+
+    def cache_id(self) -> str:
+        # Identifica também o calendário fixo, para não reaproveitar entradas da geração por período
+        return f"{self.name}:{self.EPOCH}:{self.seed}"
+
+    def fetch(self, tickers: List[str], start_date: str, end_date: str, price_field: str = 'Adj Close') -> pd.DataFrame:
+        if pd.Timestamp(start_date) < pd.Timestamp(self.EPOCH):
+            raise ValueError(f"Dados sintéticos começam em {self.EPOCH}; período pedido começa em {start_date}")
+        calendar = pd.bdate_range(self.EPOCH, end_date, inclusive='left')
+        selected = calendar >= pd.Timestamp(start_date)
+        market = np.random.default_rng([self.seed, 0]).normal(0.0004, 0.009, len(calendar))
+        columns = {}
+        for ticker in tickers:
+            rng = np.random.default_rng([self.seed, zlib.crc32(ticker.encode())])
+            beta = rng.uniform(0.5, 1.5)
+            drift = rng.normal(0.0003, 0.0004)
+            volatility = rng.uniform(0.008, 0.02)
+            initial_price = rng.uniform(20, 400)
+            # Sorteios em sequência: cada data recebe o mesmo retorno qualquer que seja end_date
+            daily_returns = drift + beta * market + rng.normal(0.0, volatility, len(calendar))
+            columns[ticker] = (initial_price * np.cumprod(1 + daily_returns))[selected]
+        return pd.DataFrame(columns, index=calendar[selected])
+
+class PriceCache:
+    """Cache em disco de preços, chaveado por fonte, tickers, período e tipo de preço.
+
+    Cada entrada guarda os valores em um .npy em ordem de coluna (a série de cada ticker é
+    contígua), o índice de datas em outro .npy e os tickers em JSON; a leitura usa memory-map.
+    """
+
+    def __init__(self, directory: str = 'results/cache'):
+        self.directory = directory
+
+    def key(self, source: PriceSource, tickers: List[str], start_date: str, end_date: str, price_field: str) -> str:
+        payload = json.dumps([source.cache_id(), sorted(tickers), start_date, end_date, price_field])
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def load(self, key: str) -> Optional[pd.DataFrame]:
+        entry = os.path.join(self.directory, key)
+        if not os.path.exists(os.path.join(entry, 'columns.json')):
+            return None
+        values = np.load(os.path.join(entry, 'values.npy'), mmap_mode='r')
+        index = pd.DatetimeIndex(np.load(os.path.join(entry, 'index.npy')))
+        with open(os.path.join(entry, 'columns.json')) as f:
+            columns = json.load(f)
+        return pd.DataFrame(values, index=index, columns=columns, copy=False)
+
+    def store(self, key: str, data: pd.DataFrame) -> None:
+        entry = os.path.join(self.directory, key)
+        os.makedirs(entry, exist_ok=True)
+        np.save(os.path.join(entry, 'values.npy'), np.asfortranarray(data.to_numpy(dtype=np.float64)))
+        np.save(os.path.join(entry, 'index.npy'), data.index.to_numpy(dtype='datetime64[ns]'))
+        # columns.json por último: marca a entrada como completa
+        with open(os.path.join(entry, 'columns.json'), 'w') as f:
+            json.dump([str(c) for c in data.columns], f)
+
+def load_prices(tickers: List[str], start_date: str, end_date: str, source: Optional[PriceSource] = None, cache: Optional[PriceCache] = None, price_field: str = 'Adj Close') -> pd.DataFrame:
+    """Carrega preços da fonte, consultando antes o cache (se houver). Tickers com dados ausentes são removidos."""
+    source = source or YFinanceSource()
+    logging.debug(f"Carregando dados de {start_date} a {end_date} via {source.name}")
+    try:
+        start = time.perf_counter()
+        key = cache.key(source, tickers, start_date, end_date, price_field) if cache else None
+        data = cache.load(key) if cache else None
+        if data is not None:
+            logging.warning(f"Cache quente ({source.name}, {start_date} a {end_date}): {time.perf_counter() - start:.3f}s")
+            return data
+
+        data = _drop_incomplete_tickers(source.fetch(tickers, start_date, end_date, price_field))
+        if cache:
+            cache.store(key, data)
+        logging.warning(f"Carga fria ({source.name}, {start_date} a {end_date}): {time.perf_counter() - start:.3f}s")
+        logging.info(f"Dados carregados: {data.shape[0]} dias, {data.shape[1]} ações")
         return data
     except Exception as e:
-        logging.error(f"Erro ao baixar dados: {e}", exc_info=True)
+        logging.error(f"Erro ao carregar dados: {e}", exc_info=True)
         raise
 
-def load_data() -> Tuple[pd.DataFrame, pd.DataFrame]:
+def download_data(tickers: list, start_date: str, end_date: str) -> pd.DataFrame:
+    """Baixa dados de preços ajustados das ações via yfinance."""
+    return load_prices(tickers, start_date, end_date, source=YFinanceSource())
+
+def load_data(source: Optional[PriceSource] = None, cache: Optional[PriceCache] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
     logging.debug("Iniciando carregamento de dados")
     try:
-        train_data = download_data(get_dow_jones_tickers(), '2024-08-01', '2024-12-31')
-        test_data = download_data(get_dow_jones_tickers(), '2023-01-01', '2024-03-31')
+        train_data = load_prices(get_dow_jones_tickers(), *TRAIN_PERIOD, source=source, cache=cache)
+        test_data = load_prices(get_dow_jones_tickers(), *TEST_PERIOD, source=source, cache=cache)
         if len(train_data.columns) < 30 or len(test_data.columns) < 30:
             logging.warning(f"Apenas {len(train_data.columns)} tickers disponíveis em treino e {len(test_data.columns)} em teste")
         logging.info("Carregamento de dados concluído")
         return train_data, test_data
     except Exception as e:
         logging.error(f"Erro no carregamento de dados: {e}", exc_info=True)
-        raise
\ No newline at end of file
+        raise
+
+def make_source(name: str, prices_file: Optional[str] = None, seed: int = 0) -> PriceSource:
+    """Cria a fonte de preços pelo nome usado na linha de comando."""
+    if name == 'yfinance':
+        return YFinanceSource()
+    if name == 'local':
+        if not prices_file:
+            raise ValueError("A fonte 'local' exige o caminho do arquivo de preços")
+        return LocalFileSource(prices_file)
+    if name == 'synthetic':
+        return SyntheticSource(seed)
+    raise ValueError(f"Fonte de preços desconhecida: {name}")
@@ -0,0 +1,80 @@
+import logging
+import numpy as np
+from typing import Callable, Dict, Tuple
+from collector import result_dtype
+from combinatorics import iter_combination_range
+from optimizer import optimize_rank_range
+from simulate import simulate_rank_range
+from utils import ReturnStatistics, combination_rng, WEIGHT_SAMPLERS, sample_capped_simplex_block, sharpe_from_moments
+import instrumentation
+
+def block_size_for(k: int, n_simulations: int, memory_budget: int) -> int:
+    """Quantas combinações de k tickers cabem em um bloco dentro de memory_budget bytes."""
+    # Sorteios brutos (~1,25 S linhas), pesos aceitos e produto pesos @ covariância, todos float64
+    per_combination = int(3.25 * n_simulations * k * 8)
+    return max(1, memory_budget // per_combination)
+
+def score_block(stats: ReturnStatistics, weights: np.ndarray, columns: np.ndarray, risk_free_rate: float = 0.02) -> np.ndarray:
+    """Calcula o Sharpe de todos os pesos de um bloco de combinações.
+
+    `weights` (B x S x k) traz os pesos sorteados de cada combinação e `columns` (B x k) os
+    índices dos seus tickers. Médias e covariâncias das B combinações são recolhidas por
+    indexação de uma vez, e médias e variâncias saem de produtos matriciais em lote.
+    Retorna os Sharpe em uma matriz B x S.
+    """
+    means = np.matmul(weights, stats.mean_returns[columns][:, :, None])[:, :, 0]
+    covariances = stats.cov_matrix[columns[:, :, None], columns[:, None, :]]
+    variances = np.einsum('bsk,bsk->bs', np.matmul(weights, covariances), weights)
+    return sharpe_from_moments(means.ravel(), variances.ravel(), risk_free_rate).reshape(means.shape)
+
+def score_rank_range(stats: ReturnStatistics, start: int, count: int, k: int, seed: int, n_simulations: int = 1000, sampler: str = 'random', memory_budget: int = 2 * 2 ** 20) -> Tuple[np.ndarray, int]:
+    """Mesma interface e resultado de simulate.simulate_rank_range, mas sorteando e avaliando blocos de combinações de uma vez.
+
+    Cada combinação sorteia seus pesos com combination_rng(seed, rank), como no caminho por
+    combinação, então a melhor carteira encontrada é a mesma. Com o amostrador random, o sorteio
+    do bloco é vetorizado (utils.sample_capped_simplex_block) e só as linhas aceitas são
+    normalizadas; só a melhor linha de cada combinação passa pelo teste do limite de 20%.
+    Os blocos são limitados por memory_budget bytes: o sorteio é limitado pela memória, e
+    blocos do tamanho do cache L2 (o padrão) são mais rápidos que blocos de centenas de
+    combinações, que saem do cache (ver benchmarks.suite).
+    """
+    n_tickers = len(stats.tickers)
+    records = np.empty(count, dtype=result_dtype(k))
+    n_valid = 0
+    block = min(block_size_for(k, n_simulations, memory_budget), count)
+    combinations = iter_combination_range(start, count, n_tickers, k)
+    buffer = np.empty((block, n_simulations, k))
+    for block_start in range(start, start + count, block):
+        n_block = min(block, start + count - block_start)
+        ranks = range(block_start, block_start + n_block)
+        columns = np.array([next(combinations) for _ in ranks], dtype=np.intp)
+        with instrumentation.stage('weights'):
+            weights = buffer[:n_block]
+            if sampler == 'random':
+                sample_capped_simplex_block(k, n_simulations, seed, ranks, out=weights)
+            else:
+                for b, rank in enumerate(ranks):
+                    weights[b] = WEIGHT_SAMPLERS[sampler](k, n_simulations, combination_rng(seed, rank))
+        with instrumentation.stage('scoring'):
+            sharpes = score_block(stats, weights, columns)
+            best = np.argmax(sharpes, axis=1)
+        for b, rank in enumerate(ranks):
+            # Se a melhor linha já é válida, ela também é a melhor entre as válidas; só as
+            # combinações em que não é passam pelo filtro completo
+            if not (np.isfinite(sharpes[b, best[b]]) and np.all(weights[b, best[b]] <= 0.2)):
+                valid = np.all(weights[b] <= 0.2, axis=1) & np.isfinite(sharpes[b])
+                if not np.any(valid):
+                    logging.error("Nenhuma simulação válida para a combinação de rank %s", rank)
+                    continue
+                best[b] = np.argmax(np.where(valid, sharpes[b], -np.inf))
+            records[n_valid] = (rank, sharpes[b, best[b]], weights[b, best[b]])
+            n_valid += 1
+        instrumentation.count('simulations', n_block * n_simulations)
+        instrumentation.count('combinations', n_block)
+    return records[:n_valid], count - n_valid
+
+RANGE_ENGINES: Dict[str, Callable[..., Tuple[np.ndarray, int]]] = {
+    'per-combination': simulate_rank_range,
+    'masked': score_rank_range,
+    'optimizer': optimize_rank_range,
+}
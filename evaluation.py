@@ -0,0 +1,109 @@
+import logging
+import numpy as np
+from typing import TYPE_CHECKING, List, Sequence, Tuple
+from combinatorics import unrank_combination
+from utils import sharpe_from_moments
+
+if TYPE_CHECKING:
+    # Só para anotações: walk_forward importa este módulo em processos que não devem carregar o pandas
+    import pandas as pd
+
+def embed_weights(records: np.ndarray, n_tickers: int, combination_size: int) -> np.ndarray:
+    """Matriz (K x n_tickers) com os pesos de cada registro (ver collector.result_dtype) nas colunas da sua combinação."""
+    weights = np.zeros((len(records), n_tickers))
+    for row, record in enumerate(records):
+        weights[row, list(unrank_combination(int(record['rank']), n_tickers, combination_size))] = record['weights']
+    return weights
+
+def rolling_windows(n_days: int, length: int, step: int) -> List[Tuple[int, int]]:
+    """Janelas [início, fim) de `length` dias de retorno avançando `step` dias; inclui sempre a última."""
+    if length < 2 or length > n_days:
+        raise ValueError(f"Janela de {length} dias inválida para {n_days} dias de retorno")
+    starts = list(range(0, n_days - length + 1, step))
+    if starts[-1] != n_days - length:
+        starts.append(n_days - length)
+    return [(start, start + length) for start in starts]
+
+class WindowMoments:
+    """Somas acumuladas dos retornos e de seus produtos cruzados, para obter média e covariância de qualquer janela em O(N^2).
+
+    As somas são centradas na média do período inteiro, o que evita a perda de precisão de
+    subtrair somas grandes de valores quase iguais.
+    """
+
+    def __init__(self, returns: np.ndarray):
+        self.returns = np.asarray(returns, dtype=np.float64)
+        self.center = self.returns.mean(axis=0)
+        centered = self.returns - self.center
+        n_days, n_tickers = centered.shape
+        self._sums = np.zeros((n_days + 1, n_tickers))
+        np.cumsum(centered, axis=0, out=self._sums[1:])
+        self._products = np.zeros((n_days + 1, n_tickers, n_tickers))
+        np.cumsum(centered[:, :, None] * centered[:, None, :], axis=0, out=self._products[1:])
+
+    def window_statistics(self, windows: Sequence[Tuple[int, int]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Médias diárias (W x N) e covariâncias anualizadas (W x N x N) das janelas [início, fim)."""
+        bounds = np.asarray(windows, dtype=np.intp)
+        starts, ends = bounds[:, 0], bounds[:, 1]
+        lengths = (ends - starts).astype(np.float64)
+        centered_means = (self._sums[ends] - self._sums[starts]) / lengths[:, None]
+        products = self._products[ends] - self._products[starts]
+        covariances = (products - lengths[:, None, None] * centered_means[:, :, None] * centered_means[:, None, :])
+        covariances *= (252 / (lengths - 1))[:, None, None]
+        return centered_means + self.center, covariances
+
+def evaluate_batch(weights: np.ndarray, means: np.ndarray, covariances: np.ndarray, risk_free_rate: float = 0.02, memory_budget: int = 64 * 2 ** 20) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Retorno anualizado, volatilidade e Sharpe de K carteiras em W janelas, como matrizes (W x K).
+
+    `weights` é (K x N) e `means`/`covariances` vêm de WindowMoments.window_statistics. As
+    variâncias saem de um produto em lote (W x K x N), calculado em blocos de janelas que
+    cabem em memory_budget bytes.
+    """
+    n_windows, n_tickers = means.shape
+    portfolio_means = means @ weights.T
+    variances = np.empty_like(portfolio_means)
+    block = max(1, memory_budget // (len(weights) * n_tickers * 8))
+    for start in range(0, n_windows, block):
+        stop = min(start + block, n_windows)
+        weighted = np.matmul(weights[None, :, :], covariances[start:stop])
+        variances[start:stop] = np.einsum('wkn,kn->wk', weighted, weights)
+    volatilities = np.sqrt(np.maximum(variances, 0.0))
+    returns = (1 + portfolio_means) ** 252 - 1
+    sharpes = sharpe_from_moments(portfolio_means.ravel(), variances.ravel(), risk_free_rate).reshape(variances.shape)
+    return returns, volatilities, sharpes
+
+def pairs_table(labels: Sequence[int], dates: 'pd.Index', windows: Sequence[Tuple[int, int]], returns: np.ndarray, volatilities: np.ndarray, sharpes: np.ndarray) -> 'pd.DataFrame':
+    """Uma linha por par (carteira, janela), em ordem decrescente de Sharpe; `dates` indexa as linhas de retorno."""
+    bounds = np.asarray(windows, dtype=np.intp)
+    n_windows, n_portfolios = sharpes.shape
+    import pandas as pd
+    table = pd.DataFrame({
+        'Carteira': np.tile(np.asarray(labels), n_windows),
+        'Inicio': np.repeat(dates[bounds[:, 0]], n_portfolios),
+        'Fim': np.repeat(dates[bounds[:, 1] - 1], n_portfolios),
+        'Retorno': returns.ravel(),
+        'Volatilidade': volatilities.ravel(),
+        'Sharpe': sharpes.ravel(),
+    })
+    return table.sort_values('Sharpe', ascending=False, kind='stable').reset_index(drop=True)
+
+def ranked_summary(labels: Sequence[int], train_sharpe: np.ndarray, full_period_sharpe: np.ndarray, sharpes: np.ndarray, returns: np.ndarray) -> 'pd.DataFrame':
+    """Tabela por carteira (Sharpe de treino e distribuição do Sharpe fora da amostra), ordenada pelo Sharpe médio de teste.
+
+    `sharpes` e `returns` (W x K) trazem só as janelas deslizantes; o Sharpe do período de
+    teste inteiro entra como coluna à parte, fora das estatísticas por janela.
+    """
+    import pandas as pd
+    table = pd.DataFrame({
+        'Carteira': list(labels),
+        'Sharpe_Treino': train_sharpe,
+        'Sharpe_Teste_Periodo': full_period_sharpe,
+        'Sharpe_Teste_Medio': sharpes.mean(axis=0),
+        'Sharpe_Teste_Min': sharpes.min(axis=0),
+        'Sharpe_Teste_Desvio': sharpes.std(axis=0),
+        'Retorno_Teste_Medio': returns.mean(axis=0),
+        'Janelas_Sharpe_Positivo': (sharpes > 0).mean(axis=0),
+    })
+    table = table.sort_values('Sharpe_Teste_Medio', ascending=False, kind='stable').reset_index(drop=True)
+    logging.info("Avaliação fora da amostra: %d carteiras em %d janelas", sharpes.shape[1], sharpes.shape[0])
+    return table
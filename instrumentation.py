@@ -0,0 +1,177 @@
+import json
+import logging
+import os
+import time
+from contextlib import nullcontext
+from typing import Dict, List, Optional
+
+# Habilitado pela variável de ambiente para que workers criados por spawn/forkserver herdem o estado
+ENV_VAR = 'PORTFOLIO_INSTRUMENTATION'
+
+_enabled = os.environ.get(ENV_VAR) == '1'
+_timers: Dict[str, List[float]] = {}   # nome -> [chamadas, segundos totais, maior duração]
+_counters: Dict[str, float] = {}
+_NULL_CONTEXT = nullcontext()
+
+# Esperas medidas de fora do trabalho (somadas entre tarefas concorrentes): ficam fora da divisão por estágio
+WAIT_STAGES = ('queue_wait', 'ipc')
+
+def reset() -> None:
+    """Descarta o que foi acumulado neste processo."""
+    _timers.clear()
+    _counters.clear()
+
+# Um worker criado por fork herdaria os cronômetros e contadores do processo principal e os
+# enviaria de volta no primeiro resumo; o filho começa sempre do zero
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset)
+
+def enable() -> None:
+    """Liga a instrumentação neste processo e nos workers criados a partir dele."""
+    global _enabled
+    _enabled = True
+    os.environ[ENV_VAR] = '1'
+
+def is_enabled() -> bool:
+    return _enabled
+
+class _Timer:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record_time(self.name, time.perf_counter() - self.start)
+        return False
+
+def stage(name: str):
+    """Context manager que cronometra um estágio; sem instrumentação devolve um contexto vazio compartilhado."""
+    if not _enabled:
+        return _NULL_CONTEXT
+    return _Timer(name)
+
+def record_time(name: str, seconds: float) -> None:
+    """Acumula uma duração medida externamente (ex.: espera na fila, IPC)."""
+    if not _enabled:
+        return
+    entry = _timers.get(name)
+    if entry is None:
+        _timers[name] = [1, seconds, seconds]
+    else:
+        entry[0] += 1
+        entry[1] += seconds
+        if seconds > entry[2]:
+            entry[2] = seconds
+
+def count(name: str, value: float = 1) -> None:
+    if _enabled:
+        _counters[name] = _counters.get(name, 0) + value
+
+def take_snapshot() -> Optional[dict]:
+    """Devolve e zera o que foi acumulado neste processo (None se desabilitado).
+
+    Os workers chamam ao fim de cada tarefa e enviam o resumo junto com o resultado.
+    """
+    if not _enabled:
+        return None
+    snapshot = {'timers': {k: list(v) for k, v in _timers.items()}, 'counters': dict(_counters)}
+    reset()
+    return snapshot
+
+def record_queue_wait(sent_at: float) -> None:
+    """No worker: registra quanto tempo a tarefa enviada em `sent_at` (time.time()) esperou até começar."""
+    if _enabled:
+        record_time('queue_wait', time.time() - sent_at)
+
+def worker_telemetry() -> Optional[dict]:
+    """No worker, ao fim da tarefa: resumo local a ser enviado ao processo principal junto com o resultado."""
+    snapshot = take_snapshot()
+    if snapshot is not None:
+        snapshot['finished_at'] = time.time()
+    return snapshot
+
+class RunProfile:
+    """Agrega, no processo principal, os resumos enviados pelos workers e a linha do tempo de vazão."""
+
+    def __init__(self, timeline_interval: float = 1.0):
+        self.timeline_interval = timeline_interval
+        self.timers: Dict[str, List[float]] = {}
+        self.counters: Dict[str, float] = {}
+        self.timeline: List[List[float]] = []
+        self._start = time.perf_counter()
+        self._completed = 0
+
+    def merge(self, snapshot: Optional[dict]) -> None:
+        """Soma o resumo de um worker; o intervalo entre o fim da tarefa e a chegada aqui conta como IPC."""
+        if not snapshot:
+            return
+        if 'finished_at' in snapshot:
+            self.add_time('ipc', time.time() - snapshot['finished_at'])
+        for name, (calls, total, longest) in snapshot['timers'].items():
+            entry = self.timers.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += calls
+            entry[1] += total
+            entry[2] = max(entry[2], longest)
+        for name, value in snapshot['counters'].items():
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_time(self, name: str, seconds: float) -> None:
+        entry = self.timers.setdefault(name, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+
+    def mark_progress(self, n_combinations: int) -> None:
+        """Registra na linha do tempo as combinações concluídas, no máximo um ponto por timeline_interval."""
+        self._completed += n_combinations
+        elapsed = time.perf_counter() - self._start
+        if not self.timeline or elapsed - self.timeline[-1][0] >= self.timeline_interval:
+            self.timeline.append([elapsed, self._completed])
+
+    def report(self) -> dict:
+        """Resumo da execução: estágios de trabalho em 'stages' e esperas (fila, IPC) em 'waits'."""
+        elapsed = time.perf_counter() - self._start
+        timings = {
+            name: {
+                'calls': int(calls),
+                'total_seconds': total,
+                'mean_microseconds': total / calls * 1e6 if calls else 0.0,
+                'max_seconds': longest,
+            }
+            for name, (calls, total, longest) in sorted(self.timers.items(), key=lambda item: -item[1][1])
+        }
+        return {
+            'elapsed_seconds': elapsed,
+            'combinations': self._completed,
+            'combinations_per_second': self._completed / elapsed if elapsed > 0 else 0.0,
+            'stages': {name: values for name, values in timings.items() if name not in WAIT_STAGES},
+            'waits': {name: values for name, values in timings.items() if name in WAIT_STAGES},
+            'counters': self.counters,
+            'timeline': self.timeline,
+        }
+
+    def export(self, path: str) -> dict:
+        """Grava o relatório em JSON e registra a divisão do tempo por estágio no log.
+
+        As porcentagens consideram só os estágios de trabalho; as esperas são somadas entre
+        tarefas que esperam ao mesmo tempo e aparecem à parte, com a média por tarefa.
+        """
+        report = self.report()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        total = sum(stage['total_seconds'] for stage in report['stages'].values()) or 1.0
+        for name, values in report['stages'].items():
+            logging.warning("Estágio %-16s %10.3fs (%5.1f%%) em %d chamadas, média %.1fus",
+                            name, values['total_seconds'], 100 * values['total_seconds'] / total,
+                            values['calls'], values['mean_microseconds'])
+        for name, values in report['waits'].items():
+            logging.warning("Espera  %-16s média %.1fus, máxima %.3fs em %d tarefas",
+                            name, values['mean_microseconds'], values['max_seconds'], values['calls'])
+        logging.warning("Instrumentação salva em %s (%.1f combinações/s)", path, report['combinations_per_second'])
+        return report
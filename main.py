@@ -1,19 +1,25 @@
-import itertools
+import argparse
 import numpy as np
-import pandas as pd
+import multiprocessing
 from multiprocessing import Pool, cpu_count
-from data_loader import load_data, get_dow_jones_tickers
 from simulate import simulate_portfolio
+from engine import RANGE_ENGINES
+from combinatorics import n_combinations, unrank_combination
+from collector import ResultCollector, result_dtype
+from branch_bound import BranchAndBound
+from checkpoint import CheckpointStore, pending_ranges, merge_ranges
+import hashlib
+from utils import ReturnStatistics, WEIGHT_SAMPLERS, calculate_daily_returns, combination_rng, compute_return_statistics, ticker_indices, subset_statistics, portfolio_volatility, sharpe_ratio
+from shared_data import publish_statistics, release_statistics
+from worker import init_worker, run_attached_range, run_simulation_range
+from cluster import Coordinator
+from contextlib import nullcontext
+from typing import Union
 import logging
+import queue
 import time
+import instrumentation
 import os
-from tqdm import tqdm
-
-try:
-    from plot_results import plot_portfolio_allocation, plot_performance_comparison
-except ImportError as e:
-    logging.error(f"Erro ao importar plot_results: {e}")
-    raise
 
 # Configuração de logging
 os.makedirs('results/logs', exist_ok=True)
@@ -25,33 +31,55 @@ logging.basicConfig(
 
 def run_simulation(args: tuple) -> dict:
     """Executa simulação para uma combinação de tickers."""
-    tickers, train_data, progress_queue = args
+    tickers, train_stats, progress_queue, rng, n_simulations, sampler = args
     try:
-        missing_tickers = [t for t in tickers if t not in train_data.columns]
-        if missing_tickers:
-            logging.error(f"Tickers ausentes em train_data: {missing_tickers}")
-            raise ValueError(f"Tickers ausentes: {missing_tickers}")
-        
-        weights, sharpe, _ = simulate_portfolio(list(tickers), train_data, n_simulations=1000, progress_queue=progress_queue)
+        weights, sharpe = simulate_portfolio(list(tickers), train_stats, n_simulations=n_simulations, progress_queue=progress_queue, rng=rng, sampler=sampler)
         return {'tickers': tickers, 'weights': weights, 'sharpe': sharpe}
     except Exception as e:
         logging.error(f"Erro na simulação {tickers}: {str(e)}", exc_info=True)
         return None
 
-def evaluate_portfolio(weights: np.ndarray, tickers: tuple, data: pd.DataFrame) -> tuple:
+def imap_bounded(pool: Pool, func, tasks, window: int):
+    """Como pool.imap_unordered, mas só retira a próxima tarefa de `tasks` quando há menos de `window` em execução.
+
+    O imap_unordered consome o iterável de tarefas antecipadamente; aqui o gerador é avançado
+    só depois que o chamador processou um resultado, o que permite gerar tarefas a partir
+    do estado atualizado (ex.: o limiar do top-K no branch-and-bound).
+    """
+    done = queue.Queue()
+    tasks = iter(tasks)
+    in_flight = 0
+    exhausted = False
+    while True:
+        while not exhausted and in_flight < window:
+            try:
+                task = next(tasks)
+            except StopIteration:
+                exhausted = True
+                break
+            pool.apply_async(func, (task,), callback=done.put, error_callback=done.put)
+            in_flight += 1
+        if in_flight == 0:
+            return
+        result = done.get()
+        in_flight -= 1
+        if isinstance(result, BaseException):
+            raise result
+        yield result
+
+def evaluate_portfolio(weights: np.ndarray, tickers: tuple, data: Union['pd.DataFrame', ReturnStatistics]) -> tuple:
     """Avalia o Sharpe Ratio, retorno e volatilidade de uma carteira em novos dados."""
-    from utils import calculate_daily_returns, portfolio_return, annualized_return, portfolio_volatility, sharpe_ratio
     logging.debug(f"Avaliando portfólio para tickers: {tickers}")
     try:
-        if data.shape[0] < 2:
-            logging.error("Dados de teste insuficientes para calcular retornos")
-            raise ValueError("Menos de 2 dias de dados em test_data")
+        if not isinstance(data, ReturnStatistics):
+            if data.shape[0] < 2:
+                logging.error("Dados de teste insuficientes para calcular retornos")
+                raise ValueError("Menos de 2 dias de dados em test_data")
+            data = compute_return_statistics(data[list(tickers)])
         
-        tickers_list = list(tickers)
-        returns = calculate_daily_returns(data[tickers_list])
-        logging.debug(f"Shape dos retornos de teste: {returns.shape}")
-        cov_matrix = np.cov(returns.T) * 252
-        port_ret = annualized_return(portfolio_return(weights, returns))
+        idx = ticker_indices(data, tickers)
+        mean_returns, cov_matrix = subset_statistics(data, idx)
+        port_ret = (1 + float(mean_returns @ weights)) ** 252 - 1
         port_vol = portfolio_volatility(weights, cov_matrix)
         logging.debug(f"Retorno: {port_ret:.4f}, Volatilidade: {port_vol:.4f}")
         if port_vol == 0:
@@ -65,35 +93,90 @@ def evaluate_portfolio(weights: np.ndarray, tickers: tuple, data: pd.DataFrame)
         logging.error(f"Erro ao avaliar portfólio: {e}", exc_info=True)
         return -np.inf, np.nan, np.nan
 
-def compare_execution_time(combinations: list, train_data: pd.DataFrame, n_runs: int = 5) -> tuple:
-    logging.info(f"Iniciando comparação de tempos ({n_runs} execuções)")
-    times_sequential = []
-    for run in range(n_runs):
-        start_time = time.time()
-        for combo in combinations[:100]:
-            run_simulation((combo, train_data, None))
-        elapsed = time.time() - start_time
-        times_sequential.append(elapsed)
-        logging.info(f"Sem paralelismo, iteração {run+1}: {elapsed:.2f}s")
-    
-    times_parallel = []
-    for run in range(n_runs):
-        start_time = time.time()
-        with Pool(processes=4) as pool:
-            pool.map(run_simulation, [(combo, train_data, None) for combo in combinations[:100]])
-        elapsed = time.time() - start_time
-        times_parallel.append(elapsed)
-        logging.info(f"Com paralelismo, iteração {run+1}: {elapsed:.2f}s")
-    
-    return np.mean(times_sequential), np.mean(times_parallel)
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Busca da carteira de maior Sharpe Ratio entre combinações do Dow Jones.")
+    parser.add_argument('--data-mode', choices=['pickle', 'shared', 'mmap'], default='shared',
+                        help="Como os workers recebem os dados: serializados em cada tarefa (pickle), "
+                             "anexados uma vez via memória compartilhada (shared) ou via .npy mapeado (mmap)")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="Semente global; cada combinação deriva a sua própria, então a execução é reproduzível "
+                             "independentemente da divisão entre workers")
+    parser.add_argument('--start-method', choices=multiprocessing.get_all_start_methods(), default=None,
+                        help="Como os workers são criados; por padrão, o método da plataforma")
+    parser.add_argument('--engine', choices=sorted(RANGE_ENGINES), default='per-combination',
+                        help="Como cada intervalo é avaliado: uma combinação por vez (per-combination), blocos de "
+                             "combinações sorteados e avaliados em lote, com o mesmo resultado e mais rápido (masked) "
+                             "ou máximo Sharpe determinístico por gradiente projetado (optimizer)")
+    parser.add_argument('--n-simulations', type=int, default=1000, help="Carteiras sorteadas por combinação")
+    parser.add_argument('--sampler', choices=sorted(WEIGHT_SAMPLERS), default='random',
+                        help="Sorteio dos pesos: pseudoaleatório (random) ou sequência de Halton embaralhada (qmc); "
+                             "ver python -m benchmarks.sampling para a comparação de convergência e custo")
+    parser.add_argument('--search', choices=['exhaustive', 'branch-and-bound'], default='exhaustive',
+                        help="Avalia todas as combinações (exhaustive) ou pula famílias de combinações cujo limite "
+                             "superior de Sharpe fica abaixo do top-K atual (branch-and-bound); o top-K é o mesmo")
+    parser.add_argument('--combination-size', type=int, default=25, help="Número de tickers por combinação")
+    parser.add_argument('--chunk-size', type=int, default=50,
+                        help="Número de combinações (ranks consecutivos) enviadas por tarefa")
+    parser.add_argument('--start-rank', type=int, default=0, help="Primeiro rank de combinação a simular")
+    parser.add_argument('--top-k', type=int, default=10, help="Número de melhores carteiras mantidas durante a busca")
+    parser.add_argument('--checkpoint-dir', default='results/checkpoints',
+                        help="Diretório dos shards de resultados e do manifesto de intervalos concluídos")
+    parser.add_argument('--resume', action='store_true',
+                        help="Retoma a execução do checkpoint existente, pulando os intervalos já concluídos")
+    parser.add_argument('--overwrite-checkpoint', action='store_true',
+                        help="Descarta um checkpoint inacabado com outra configuração (sem a opção, a execução é recusada)")
+    parser.add_argument('--data-source', choices=['yfinance', 'local', 'synthetic'], default='yfinance',
+                        help="Fonte dos preços: API do yfinance, arquivo local (--prices-file) ou série sintética determinística")
+    parser.add_argument('--prices-file', default=None, help="Arquivo .csv/.parquet de preços para --data-source local")
+    parser.add_argument('--cache-dir', default='results/cache', help="Diretório do cache de preços em disco")
+    parser.add_argument('--no-cache', action='store_true', help="Ignora o cache de preços e sempre consulta a fonte")
+    parser.add_argument('--instrument', action='store_true',
+                        help="Mede o tempo de cada estágio (retornos, covariância, pesos, Sharpe, fila, IPC) nos workers")
+    parser.add_argument('--instrument-output', default='results/instrumentation.json',
+                        help="Arquivo JSON com a divisão por estágio e a linha do tempo de vazão")
+    parser.add_argument('--test-window', type=int, default=63,
+                        help="Dias de retorno de cada janela de teste usada para avaliar as top-K carteiras")
+    parser.add_argument('--test-step', type=int, default=21, help="Avanço, em dias, entre janelas de teste consecutivas")
+    parser.add_argument('--cluster-listen', default=None,
+                        help="Coordena workers remotos em vez do Pool local: escuta em HOST:PORTA (':PORTA' só em 127.0.0.1) "
+                             "ou num socket Unix (workers: python -m cluster worker --connect ENDEREÇO --authkey CHAVE)")
+    parser.add_argument('--authkey', default=None,
+                        help="Com --cluster-listen, chave compartilhada com os workers (padrão: variável "
+                             "PORTFOLIO_CLUSTER_AUTHKEY; sem nenhuma, uma chave aleatória é gerada e registrada no log)")
+    parser.add_argument('--local-workers', type=int, default=0,
+                        help="Com --cluster-listen, inicia N workers locais conectados ao coordenador")
+    parser.add_argument('--task-timeout', type=float, default=600.0,
+                        help="Com --cluster-listen, segundos sem resposta após os quais o intervalo é reenviado a outro worker")
+    parser.add_argument('--stop-rank', type=int, default=None,
+                        help="Rank final (exclusivo); por padrão, todas as combinações")
+    return parser.parse_args()
 
 if __name__ == '__main__':
+    # Dependências pesadas só no processo principal: sob spawn/forkserver os workers reimportam
+    # este módulo como __mp_main__, executando apenas o nível superior
+    import pandas as pd
+    from tqdm import tqdm
+    from data_loader import load_data, get_dow_jones_tickers, make_source, PriceCache
+    from evaluation import WindowMoments, embed_weights, evaluate_batch, rolling_windows, pairs_table, ranked_summary
+
+    args = parse_args()
+    if args.instrument:
+        instrumentation.enable()
     logging.info("Iniciando o programa")
+    saved_config = CheckpointStore.read_config(args.checkpoint_dir) if args.resume else None
+    if args.seed is not None:
+        seed = args.seed
+    elif saved_config is not None:
+        seed = saved_config['seed']
+    else:
+        seed = np.random.SeedSequence().entropy
+    logging.warning(f"Semente da execução: {seed} (use --seed {seed} para reproduzir)")
     logging.info(f"Número de CPUs disponíveis: {cpu_count()}")
     
     # Carregar dados
     logging.debug("Carregando dados...")
-    train_data, test_data = load_data()
+    source = make_source(args.data_source, args.prices_file)
+    train_data, test_data = load_data(source=source, cache=None if args.no_cache else PriceCache(args.cache_dir))
     logging.info(f"Dados de treino: {train_data.shape[0]} dias, {train_data.shape[1]} ações")
     logging.info(f"Dados de teste: {test_data.shape[0]} dias, {test_data.shape[1]} ações")
     if train_data.empty or test_data.empty:
@@ -103,44 +186,134 @@ if __name__ == '__main__':
         logging.error("Dados de treino insuficientes")
         raise ValueError("Menos de 2 dias de dados em train_data")
 
-    # Gerar combinações de 25 ações
+    # Pré-calcular estatísticas de retorno do universo uma única vez, na ordem dos tickers do índice
     tickers = [t for t in get_dow_jones_tickers() if t in train_data.columns]
-    n_tickers_per_combination = 25
-    combinations = list(itertools.combinations(tickers, n_tickers_per_combination))
-    logging.info(f"Total de combinações: {len(combinations)}")
+    train_stats = compute_return_statistics(train_data[tickers])
+    test_stats = compute_return_statistics(test_data)
+
+    # Combinações endereçadas pelo rank lexicográfico; nenhuma lista é materializada
+    n_tickers_per_combination = args.combination_size
+    total_combinations = n_combinations(len(tickers), n_tickers_per_combination)
+    stop_rank = total_combinations if args.stop_rank is None else min(args.stop_rank, total_combinations)
+    n_requested = max(stop_rank - args.start_rank, 0)
+    logging.info(f"Total de combinações: {total_combinations}, simulando ranks [{args.start_rank}, {stop_rank})")
     
-    if not combinations:
+    if n_requested == 0:
         logging.error("Nenhuma combinação gerada")
         raise ValueError("Não foi possível gerar combinações")
 
     # Testar uma simulação
-    test_result = run_simulation((combinations[0], train_data, None))
+    first_combination = tuple(tickers[i] for i in unrank_combination(args.start_rank, len(tickers), n_tickers_per_combination))
+    test_result = run_simulation((first_combination, train_stats, None, combination_rng(seed, args.start_rank), args.n_simulations, args.sampler))
     if test_result is None:
         logging.error("Simulação de teste falhou")
         raise ValueError("Simulação de teste falhou")
 
-    # Comparar tempos
-    seq_time, par_time = compare_execution_time(combinations, train_data)
-    logging.info(f"Tempo médio sem paralelismo: {seq_time:.2f}s")
-    logging.info(f"Tempo médio com paralelismo: {par_time:.2f}s")
-
-    # Executar simulações em paralelo
-    results = []
-    with Pool(processes=6, maxtasksperchild=100) as pool:
-        with tqdm(total=len(combinations), desc="Simulando combinações", unit="comb") as pbar:
-            for result in pool.imap_unordered(run_simulation, [(combo, train_data, None) for combo in combinations]):
-                if result is not None:
-                    results.append(result)
-                pbar.update(1)
-
-    if not results:
+    # Checkpoint só de acréscimo: retoma resultados já gravados e pula os intervalos concluídos
+    collector = ResultCollector(args.top_k, n_tickers_per_combination)
+    store = CheckpointStore(args.checkpoint_dir, {
+        'seed': seed,
+        'combination_size': n_tickers_per_combination,
+        'tickers': tickers,
+        'n_simulations': args.n_simulations,
+        # O otimizador e cada amostrador produzem pesos diferentes; masked e per-combination são intercambiáveis
+        'search': 'max-sharpe' if args.engine == 'optimizer' else args.sampler,
+        'data_hash': hashlib.sha1(np.ascontiguousarray(train_stats.returns).tobytes()).hexdigest(),
+    })
+    store.start(args.resume, overwrite=args.overwrite_checkpoint)
+    for records in store.iter_records():
+        collector.add(records)
+    collector.failures += store.completed_failures()
+    completed = store.completed_ranges()
+    n_done = sum(max(min(s + c, stop_rank) - max(s, args.start_rank), 0) for s, c in merge_ranges(completed))
+    if n_done:
+        logging.warning(f"{n_done} combinações já concluídas no checkpoint serão puladas")
+
+    # Executar simulações em paralelo; cada tarefa é um intervalo (start_rank, count)
+    profile = instrumentation.RunProfile()
+    n_processes = 6
+    if args.search == 'branch-and-bound':
+        # Famílias de até chunk_size combinações viram tarefas; as maiores são limitadas antes de abrir
+        search = BranchAndBound(train_stats, n_tickers_per_combination, collector, leaf_size=args.chunk_size)
+        empty_records = np.empty(0, dtype=result_dtype(n_tickers_per_combination))
+
+        def record_pruned(start: int, count: int) -> None:
+            store.add(start, count, empty_records, 0)
+            pbar.update(count)
+
+        ranges = search.ranges(args.start_rank, stop_rank, args.chunk_size, completed, on_prune=record_pruned)
+    else:
+        ranges = pending_ranges(args.start_rank, stop_rank, args.chunk_size, completed)
+    if args.cluster_listen:
+        # Workers remotos recebem as estatísticas na conexão; nada é publicado localmente
+        handles = []
+    elif args.data_mode == 'pickle':
+        pool_kwargs = {}
+        tasks = ((start, count, train_stats, n_tickers_per_combination, seed, args.engine, args.n_simulations, args.sampler, time.time()) for start, count in ranges)
+        worker = run_simulation_range
+        handles = []
+    else:
+        # Dados publicados uma única vez; cada tarefa envia apenas o intervalo de ranks
+        handles, spec = publish_statistics(train_stats, backend=args.data_mode)
+        pool_kwargs = {'initializer': init_worker, 'initargs': (spec, seed, n_tickers_per_combination, args.engine, args.n_simulations, args.sampler)}
+        tasks = ((start, count, time.time()) for start, count in ranges)
+        worker = run_attached_range
+    try:
+        if args.cluster_listen:
+            coordinator = Coordinator(args.cluster_listen, train_stats, seed, n_tickers_per_combination, args.engine,
+                                      authkey=args.authkey, task_timeout=args.task_timeout, n_simulations=args.n_simulations, sampler=args.sampler)
+            logging.warning(f"Coordenador escutando em {coordinator.listen_address}")
+            coordinator.start_local_workers(args.local_workers)
+            executor = nullcontext()
+        else:
+            executor = multiprocessing.get_context(args.start_method).Pool(processes=n_processes, maxtasksperchild=100, **pool_kwargs)
+        with executor as pool:
+            with tqdm(total=n_requested, initial=n_done, desc="Simulando combinações", unit="comb") as pbar:
+                if args.cluster_listen:
+                    results = coordinator.results(ranges)
+                elif args.search == 'branch-and-bound':
+                    results = imap_bounded(pool, worker, tasks, window=2 * n_processes)
+                else:
+                    results = pool.imap_unordered(worker, tasks)
+                for start, count, records, failures, telemetry in results:
+                    with instrumentation.stage('collect'):
+                        collector.add(records, failures)
+                        store.add(start, count, records, failures)
+                    profile.merge(telemetry)
+                    profile.mark_progress(count)
+                    pbar.update(count)
+        store.mark_complete()
+    finally:
+        store.flush()
+        release_statistics(handles)
+        if instrumentation.is_enabled():
+            profile.merge(instrumentation.take_snapshot())
+            profile.export(args.instrument_output)
+
+    if collector.count == 0:
         logging.error("Nenhum resultado válido")
         raise ValueError("Nenhum resultado válido gerado")
 
-    logging.info(f"Total de simulações válidas processadas: {len(results)}/{len(combinations)}")
+    logging.info(f"Total de simulações válidas processadas: {collector.count}/{collector.count + collector.failures}")
+    collector.log_summary()
+    # Histograma do Sharpe de todas as combinações, acumulado durante a busca
+    pd.DataFrame({
+        'Sharpe_Min': collector.histogram_edges[:-1],
+        'Sharpe_Max': collector.histogram_edges[1:],
+        'Combinacoes': collector.histogram,
+    }).to_csv('results/sharpe_histogram.csv', index=False)
+    if args.search == 'branch-and-bound':
+        search.log_summary()
+    if args.cluster_listen:
+        logging.warning(f"Cluster: {coordinator.workers_seen} workers conectados, {coordinator.reissued} intervalos reenviados")
 
     # Encontrar a melhor carteira
-    best_portfolio = max(results, key=lambda x: x['sharpe'])
+    best_record = collector.top()[0]
+    best_portfolio = {
+        'tickers': tuple(tickers[i] for i in unrank_combination(int(best_record['rank']), len(tickers), n_tickers_per_combination)),
+        'weights': best_record['weights'].astype(np.float64),
+        'sharpe': float(best_record['sharpe']),
+    }
     logging.info(f"Melhor Sharpe Ratio: {best_portfolio['sharpe']:.4f}")
 
     # Salvar resultados
@@ -154,7 +327,7 @@ if __name__ == '__main__':
     logging.info("Resultados salvos em results/best_portfolio.csv")
 
     # Avaliar no período de teste
-    test_sharpe, test_return, test_vol = evaluate_portfolio(best_portfolio['weights'], best_portfolio['tickers'], test_data)
+    test_sharpe, test_return, test_vol = evaluate_portfolio(best_portfolio['weights'], best_portfolio['tickers'], test_stats)
     logging.info(f"Sharpe Ratio no período de teste: {test_sharpe:.4f}")
 
     # Salvar métricas
@@ -165,10 +338,30 @@ if __name__ == '__main__':
     metrics_df.to_csv('results/performance_metrics.csv', index=False)
     logging.info("Métricas salvas em results/performance_metrics.csv")
 
-    # Gerar gráficos
+    # Avaliar todas as top-K no período de teste inteiro e em janelas deslizantes, de uma vez
+    top_records = collector.top()
+    # Só os tickers com dados também no período de teste; os pesos dos demais são descartados e renormalizados
+    test_columns = [i for i, t in enumerate(tickers) if t in test_data.columns]
+    if len(test_columns) < len(tickers):
+        logging.warning(f"Tickers sem dados no período de teste, fora da avaliação das top-K: "
+                        f"{[t for t in tickers if t not in test_data.columns]}")
+    top_weights = embed_weights(top_records, len(tickers), n_tickers_per_combination)[:, test_columns]
+    top_weights /= np.where(top_weights.sum(axis=1, keepdims=True) > 0, top_weights.sum(axis=1, keepdims=True), 1.0)
+    test_returns = calculate_daily_returns(test_data[[tickers[i] for i in test_columns]])
+    test_dates = test_data.index[-len(test_returns):]
+    windows = [(0, len(test_returns))] + rolling_windows(len(test_returns), min(args.test_window, len(test_returns)), args.test_step)
+    window_means, window_covariances = WindowMoments(test_returns).window_statistics(windows)
+    test_returns_k, test_vols_k, test_sharpes_k = evaluate_batch(top_weights, window_means, window_covariances)
+    labels = top_records['rank']
+    # A primeira linha é o período inteiro; as estatísticas de robustez usam só as janelas deslizantes
+    ranked_summary(labels, top_records['sharpe'], test_sharpes_k[0], test_sharpes_k[1:], test_returns_k[1:]).to_csv('results/top_k_out_of_sample.csv', index=False)
+    pairs_table(labels, test_dates, windows, test_returns_k, test_vols_k, test_sharpes_k).to_csv('results/top_k_test_windows.csv', index=False)
+    logging.info("Avaliação das top-K salva em results/top_k_out_of_sample.csv e results/top_k_test_windows.csv")
+
+    # Gerar gráficos (matplotlib/seaborn só são importados aqui)
     try:
+        from plot_results import plot_portfolio_allocation
         plot_portfolio_allocation(portfolio_df)
-        plot_performance_comparison(seq_time, par_time)
         logging.info("Gráficos gerados em results/plots/")
     except Exception as e:
         logging.error(f"Erro ao gerar gráficos: {e}", exc_info=True)
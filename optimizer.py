@@ -0,0 +1,101 @@
+import logging
+import numpy as np
+from typing import Callable, Optional, Tuple
+from collector import result_dtype
+from combinatorics import iter_combination_range
+from utils import ReturnStatistics, subset_statistics
+import instrumentation
+
+def project_capped_simplex(v: np.ndarray, max_weight: float = 0.2) -> np.ndarray:
+    """Projeção euclidiana de v em {w : sum(w) = 1, 0 <= w <= max_weight}.
+
+    A projeção é clip(v - tau, 0, max_weight) para o tau em que a soma vale 1; essa soma é
+    linear por partes em tau, com quebras em v e v - max_weight, então basta avaliá-la nas
+    quebras e interpolar no intervalo que contém 1.
+    """
+    breakpoints = np.sort(np.concatenate([v - max_weight, v]))
+    sums = np.clip(v[:, None] - breakpoints[None, :], 0.0, max_weight).sum(axis=0)
+    # sums é decrescente em tau: encontra quebras vizinhas com sums[i] >= 1 >= sums[i + 1]
+    i = np.searchsorted(-sums, -1.0, side='right') - 1
+    i = min(max(i, 0), len(breakpoints) - 2)
+    lo, hi = breakpoints[i], breakpoints[i + 1]
+    s_lo, s_hi = sums[i], sums[i + 1]
+    tau = lo if s_lo == s_hi else lo + (s_lo - 1.0) * (hi - lo) / (s_lo - s_hi)
+    return np.clip(v - tau, 0.0, max_weight)
+
+def _sharpe_and_gradient(w: np.ndarray, mean_returns: np.ndarray, cov_matrix: np.ndarray, risk_free_rate: float) -> Tuple[float, np.ndarray]:
+    """Sharpe anualizado (mesma definição de utils.sharpe_ratio) e seu gradiente em relação a w."""
+    mean = float(mean_returns @ w)
+    cov_w = cov_matrix @ w
+    volatility = float(np.sqrt(max(w @ cov_w, 0.0)))
+    if volatility == 0:
+        return -np.inf, np.zeros_like(w)
+    excess = (1 + mean) ** 252 - 1 - risk_free_rate
+    d_return = 252 * (1 + mean) ** 251
+    gradient = d_return * mean_returns / volatility - excess * cov_w / volatility ** 3
+    return excess / volatility, gradient
+
+def projected_ascent(objective: Callable[[np.ndarray], Tuple[float, np.ndarray]], w0: np.ndarray, max_weight: float = 0.2, max_iter: int = 500, tol: float = 1e-9) -> Tuple[np.ndarray, float, int]:
+    """Maximiza `objective` (que retorna valor e gradiente) no simplex limitado por gradiente projetado com busca de passo.
+
+    Parte de w0 projetado no conjunto viável. Retorna os pesos, o valor e o número de iterações.
+    """
+    w = project_capped_simplex(w0, max_weight)
+    value, gradient = objective(w)
+    step = 1.0 / max(np.abs(gradient).max(), 1e-12)
+    for iteration in range(1, max_iter + 1):
+        while True:
+            candidate = project_capped_simplex(w + step * gradient, max_weight)
+            candidate_value, candidate_gradient = objective(candidate)
+            # Condição de Armijo para ascensão no arco projetado
+            if candidate_value >= value + 1e-4 * gradient @ (candidate - w) or step < 1e-12:
+                break
+            step *= 0.5
+        moved = np.abs(candidate - w).max()
+        improved = candidate_value - value
+        if candidate_value >= value:
+            w, value, gradient = candidate, candidate_value, candidate_gradient
+        if moved < tol or 0 <= improved < tol * max(abs(value), 1.0):
+            return w, value, iteration
+        step *= 2.0
+    return w, value, max_iter
+
+def max_sharpe_weights(mean_returns: np.ndarray, cov_matrix: np.ndarray, w0: Optional[np.ndarray] = None, max_weight: float = 0.2, risk_free_rate: float = 0.02, max_iter: int = 500, tol: float = 1e-9) -> Tuple[np.ndarray, float, int]:
+    """Maximiza o Sharpe com w >= 0, w <= max_weight e soma 1, partindo de w0 ou dos pesos iguais.
+
+    Retorna os pesos, o Sharpe e o número de iterações.
+    """
+    n = len(mean_returns)
+    return projected_ascent(lambda w: _sharpe_and_gradient(w, mean_returns, cov_matrix, risk_free_rate),
+                            np.full(n, 1.0 / n) if w0 is None else w0, max_weight, max_iter, tol)
+
+def optimize_rank_range(stats: ReturnStatistics, start: int, count: int, k: int, seed: int = 0, n_simulations: int = 1000, sampler: str = 'random') -> Tuple[np.ndarray, int]:
+    """Mesma interface de simulate.simulate_rank_range, mas resolvendo o máximo Sharpe de cada combinação.
+
+    Toda combinação parte da solução do universo completo restrita aos seus tickers: com
+    k próximo de N, essa carteira é vizinha da ótima de cada combinação e o ponto de partida
+    (logo o resultado) não depende de como os ranks são divididos entre as tarefas. `seed`,
+    `n_simulations` e `sampler` são ignorados: o método é determinístico.
+    """
+    records = np.empty(count, dtype=result_dtype(k))
+    n_valid = 0
+    n_tickers = len(stats.tickers)
+    with instrumentation.stage('optimize'):
+        anchor, _, _ = max_sharpe_weights(stats.mean_returns, stats.cov_matrix)
+    for rank, combination in enumerate(iter_combination_range(start, count, n_tickers, k), start):
+        idx = np.asarray(combination, dtype=np.intp)
+        try:
+            with instrumentation.stage('slice_statistics'):
+                mean_returns, cov_matrix = subset_statistics(stats, idx)
+            with instrumentation.stage('optimize'):
+                w0 = anchor[idx] if anchor[idx].sum() > 0 else None
+                weights, sharpe, iterations = max_sharpe_weights(mean_returns, cov_matrix, w0)
+            if not np.isfinite(sharpe):
+                raise ValueError("Sharpe inválido")
+            records[n_valid] = (rank, sharpe, weights)
+            n_valid += 1
+            instrumentation.count('optimizer_iterations', iterations)
+            instrumentation.count('combinations')
+        except Exception as e:
+            logging.error("Erro na otimização da combinação de rank %s: %s", rank, e, exc_info=True)
+    return records[:n_valid], count - n_valid
@@ -22,22 +22,44 @@ def plot_portfolio_allocation(portfolio: pd.DataFrame):
         logging.error(f"Erro ao gerar gráfico de alocação: {e}")
         raise
 
-def plot_performance_comparison(seq_time: float, par_time: float):
-    logging.debug("Gerando gráfico de comparação de tempos")
+def plot_scaling_efficiency(report: dict, path: str = 'results/plots/scaling_efficiency.png'):
+    """Gera os gráficos de vazão e eficiência de escala a partir do relatório de benchmarks.suite."""
+    logging.debug("Gerando gráfico de escalabilidade")
     try:
-        if par_time >= seq_time:
-            logging.warning(f"Paralelismo ({par_time}s) não foi mais rápido que sequencial ({seq_time}s)")
-        plt.figure(figsize=(8, 5))
-        times = [seq_time, par_time]
-        labels = ['Sem Paralelismo', 'Com Paralelismo']
-        sns.barplot(x=labels, y=times)
-        plt.title('Comparação de Tempo de Execução')
-        plt.ylabel('Tempo (segundos)')
-        plt.tight_layout()
-        os.makedirs('results/plots', exist_ok=True)
-        plt.savefig('results/plots/performance_comparison.png')
-        plt.close()
-        logging.info("Gráfico de comparação salvo em results/plots/performance_comparison.png")
+        results = pd.DataFrame([
+            {'engine': r.get('engine', 'per-combination'), 'backend': r['backend'], 'workers': r['workers'],
+             'batch_size': r['batch_size'], 'rate': r['combinations_per_second']['mean'],
+             'ci95': r['combinations_per_second']['ci95']}
+            for r in report['results']
+        ])
+        keys = ['engine', 'batch_size']
+        serial = results[results['backend'] == 'serial'].set_index(keys)['rate']
+        if serial.empty:
+            # Sem medição serial, a referência é o backend com um worker
+            serial = results[results['workers'] == 1].groupby(keys)['rate'].max()
+        baseline = results.set_index(keys).index.map(serial).to_numpy(dtype=float)
+        results['efficiency'] = results['rate'] / (baseline * results['workers'])
+        results['config'] = (results['engine'] + ' / ' + results['backend'] +
+                             ' (lote ' + results['batch_size'].astype(str) + ')')
+
+        fig, (ax_rate, ax_eff) = plt.subplots(1, 2, figsize=(14, 5))
+        for config, group in results.sort_values('workers').groupby('config'):
+            ax_rate.errorbar(group['workers'], group['rate'], yerr=group['ci95'], marker='o', capsize=3, label=config)
+            ax_eff.plot(group['workers'], group['efficiency'], marker='o', label=config)
+        ax_rate.set_title('Vazão por número de workers')
+        ax_rate.set_xlabel('Workers')
+        ax_rate.set_ylabel('Combinações por segundo')
+        ax_eff.axhline(1.0, color='gray', linestyle='--', linewidth=1)
+        ax_eff.set_title('Eficiência de escala (vazão / (serial x workers))')
+        ax_eff.set_xlabel('Workers')
+        ax_eff.set_ylabel('Eficiência')
+        ax_eff.legend(fontsize='small')
+        fig.suptitle(f"Commit {report.get('commit', '')[:10]}")
+        fig.tight_layout()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fig.savefig(path)
+        plt.close(fig)
+        logging.info(f"Gráfico de escalabilidade salvo em {path}")
     except Exception as e:
-        logging.error(f"Erro ao gerar gráfico de comparação: {e}")
-        raise
\ No newline at end of file
+        logging.error(f"Erro ao gerar gráfico de escalabilidade: {e}")
+        raise
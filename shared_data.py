@@ -0,0 +1,99 @@
+import numpy as np
+import os
+import shutil
+import sys
+import logging
+import tempfile
+from multiprocessing import shared_memory
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+from utils import ReturnStatistics
+
+class SharedArraySpec(NamedTuple):
+    """Descreve um array publicado em memória compartilhada ou em um arquivo .npy mapeado."""
+    location: str  # nome do bloco de memória compartilhada ou caminho do arquivo .npy
+    shape: Tuple[int, ...]
+    dtype: str
+    backend: str   # 'shared' ou 'mmap'
+
+class SharedDataSpec(NamedTuple):
+    """Tudo o que um worker precisa para reconstruir as estatísticas sem receber o DataFrame."""
+    tickers: Tuple[str, ...]
+    arrays: Dict[str, SharedArraySpec]
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    # A partir do Python 3.13 o worker não deve registrar o bloco no resource tracker,
+    # senão ele seria liberado quando o worker fosse reciclado.
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+def share_array(array: np.ndarray) -> Tuple[shared_memory.SharedMemory, SharedArraySpec]:
+    """Copia um array para um novo bloco de memória compartilhada."""
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+    view[...] = array
+    return shm, SharedArraySpec(shm.name, array.shape, array.dtype.str, 'shared')
+
+def save_array_mmap(array: np.ndarray, path: str) -> SharedArraySpec:
+    """Grava um array em um arquivo .npy que os workers abrem com memory-map."""
+    np.save(path, array)
+    return SharedArraySpec(path, array.shape, array.dtype.str, 'mmap')
+
+def attach_array(spec: SharedArraySpec) -> Tuple[object, np.ndarray]:
+    """Abre um array publicado sem copiá-lo. Retorna o handle que mantém o buffer vivo e a view."""
+    if spec.backend == 'shared':
+        shm = _attach_shared_memory(spec.location)
+        return shm, np.ndarray(spec.shape, dtype=np.dtype(spec.dtype), buffer=shm.buf)
+    if spec.backend == 'mmap':
+        array = np.load(spec.location, mmap_mode='r')
+        return array, array
+    raise ValueError(f"Backend desconhecido: {spec.backend}")
+
+def publish_statistics(stats: ReturnStatistics, backend: str = 'shared', directory: Optional[str] = None) -> Tuple[List[Union[shared_memory.SharedMemory, str]], SharedDataSpec]:
+    """Publica as estatísticas uma única vez para todos os workers.
+
+    Retorna os recursos criados (blocos de memória compartilhada ou, no modo mmap, o diretório
+    temporário desta execução dentro de `directory`), que devem ser liberados com
+    release_statistics ao final, e a especificação enviada aos workers pelo initializer.
+    """
+    logging.debug(f"Publicando estatísticas via {backend}")
+    arrays = {
+        'returns': stats.returns,
+        'mean_returns': stats.mean_returns,
+        'cov_matrix': stats.cov_matrix,
+    }
+    handles = []
+    try:
+        specs = {}
+        if backend == 'shared':
+            for key, array in arrays.items():
+                shm, specs[key] = share_array(np.ascontiguousarray(array))
+                handles.append(shm)
+        elif backend == 'mmap':
+            if directory is not None:
+                os.makedirs(directory, exist_ok=True)
+            # Diretório próprio por execução: execuções simultâneas não sobrescrevem os arquivos umas das outras
+            directory = tempfile.mkdtemp(prefix='portfolio-shared-', dir=directory)
+            handles.append(directory)
+            for key, array in arrays.items():
+                specs[key] = save_array_mmap(np.ascontiguousarray(array), os.path.join(directory, f"{key}.npy"))
+        else:
+            raise ValueError(f"Backend desconhecido: {backend}")
+        logging.info(f"Estatísticas publicadas via {backend}: {sum(a.nbytes for a in arrays.values())} bytes")
+        return handles, SharedDataSpec(tuple(stats.tickers), specs)
+    except Exception as e:
+        logging.error(f"Erro ao publicar estatísticas: {e}", exc_info=True)
+        release_statistics(handles)
+        raise
+
+def release_statistics(handles: List[Union[shared_memory.SharedMemory, str]]) -> None:
+    """Fecha e remove os blocos de memória compartilhada e os diretórios temporários criados por publish_statistics."""
+    for shm in handles:
+        if isinstance(shm, str):
+            shutil.rmtree(shm, ignore_errors=True)
+            continue
+        try:
+            shm.close()
+            shm.unlink()
+        except FileNotFoundError:
+            logging.warning(f"Bloco de memória compartilhada {shm.name} já removido")
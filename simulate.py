@@ -1,90 +1,89 @@
 import numpy as np
-from typing import Tuple, List
-from utils import calculate_daily_returns, generate_random_weights, portfolio_return, annualized_return, portfolio_volatility, sharpe_ratio
-import pandas as pd
+from typing import TYPE_CHECKING, Tuple, List, Optional, Union
+from combinatorics import iter_combination_range
+from collector import result_dtype
+from utils import ReturnStatistics, combination_rng, compute_return_statistics, ticker_indices, subset_statistics, WEIGHT_SAMPLERS, batch_sharpe_from_moments
 import logging
-from tqdm import tqdm
+import instrumentation
 
-def simulate_portfolio(tickers: List[str], prices: pd.DataFrame, n_simulations: int = 1000, progress_queue=None) -> Tuple[np.ndarray, float, np.ndarray]:
-    """Simula n_simulations carteiras para uma combinação de tickers, respeitando restrições de pesos."""
-    logging.debug(f"Simulando {n_simulations} carteiras para {tickers}")
+if TYPE_CHECKING:
+    import pandas as pd
+
+def simulate_portfolio(tickers: List[str], data: Union['pd.DataFrame', ReturnStatistics], n_simulations: int = 1000, progress_queue=None, rng: Optional[np.random.Generator] = None, sampler: str = 'random') -> Tuple[np.ndarray, float]:
+    """Simula n_simulations carteiras para uma combinação de tickers, respeitando restrições de pesos.
+
+    `data` pode ser o DataFrame de preços ou um ReturnStatistics pré-calculado; neste caso a
+    combinação apenas fatia o vetor de médias e a matriz de covariância, sem trabalho em pandas.
+    `rng` permite reproduzir a execução (ver utils.combination_rng); sem ele é usada entropia nova.
+    `sampler` escolhe o amostrador de pesos em utils.WEIGHT_SAMPLERS ('random' ou 'qmc').
+    Retorna os pesos e o Sharpe da melhor carteira sorteada.
+    """
+    logging.debug("Simulando %s carteiras para %s", n_simulations, tickers)
     try:
-        # Verificar tickers ausentes no DataFrame
-        missing_tickers = [t for t in tickers if t not in prices.columns]
-        if missing_tickers:
-            logging.error(f"Tickers ausentes no DataFrame: {missing_tickers}")
-            raise ValueError(f"Tickers ausentes: {missing_tickers}")
-        
-        # Verificar se há dados suficientes
-        if prices.shape[0] < 2:
-            logging.error("Dados insuficientes para calcular retornos")
-            raise ValueError("Menos de 2 dias de dados")
-        
-        # Calcular retornos diários
-        returns = calculate_daily_returns(prices[tickers])
-        if returns.size == 0 or np.all(np.isnan(returns)):
-            logging.error("Matriz de retornos vazia ou contém apenas NaN")
-            raise ValueError("Matriz de retornos inválida")
-        logging.debug(f"Shape dos retornos: {returns.shape}")
-        
-        # Calcular matriz de covariância anualizada
-        cov_matrix = np.cov(returns.T) * 252
-        if np.any(np.isnan(cov_matrix)) or np.any(np.isinf(cov_matrix)):
-            logging.error("Matriz de covariância contém NaN ou Inf")
-            raise ValueError("Matriz de covariância inválida")
-        logging.debug(f"Shape da matriz de covariância: {cov_matrix.shape}")
+        if not isinstance(data, ReturnStatistics):
+            # Verificar tickers ausentes no DataFrame
+            missing_tickers = [t for t in tickers if t not in data.columns]
+            if missing_tickers:
+                logging.error("Tickers ausentes no DataFrame: %s", missing_tickers)
+                raise ValueError(f"Tickers ausentes: {missing_tickers}")
+            
+            # Verificar se há dados suficientes
+            if data.shape[0] < 2:
+                logging.error("Dados insuficientes para calcular retornos")
+                raise ValueError("Menos de 2 dias de dados")
+            
+            data = compute_return_statistics(data[list(tickers)])
         
-        # Gerar pesos aleatórios (já respeitando w_i <= 0.2 em generate_random_weights)
-        weights = generate_random_weights(len(tickers), n_simulations)
-        logging.debug(f"Shape dos pesos: {weights.shape}")
+        # Fatiar médias e covariância da combinação a partir das estatísticas do universo
+        with instrumentation.stage('slice_statistics'):
+            idx = ticker_indices(data, tickers)
+            mean_returns, cov_matrix = subset_statistics(data, idx)
+        logging.debug("Shape da matriz de covariância: %s", cov_matrix.shape)
         
-        # Verificar se gerou o número esperado de simulações
-        if len(weights) < n_simulations:
-            logging.warning(f"Gerou apenas {len(weights)} pesos válidos, ajustando n_simulations")
-            n_simulations = len(weights)
-        weights = weights[:n_simulations]  # Garantir o número correto de simulações
+        # Sortear pesos (sum=1, w>=0 e w<=0.2 por construção)
+        if rng is None:
+            rng = np.random.default_rng()
+        with instrumentation.stage('weights'):
+            weights = WEIGHT_SAMPLERS[sampler](len(tickers), n_simulations, rng)
+        logging.debug("Shape dos pesos: %s", weights.shape)
         
-        # Inicializar variáveis para encontrar o melhor Sharpe
-        best_sharpe = -np.inf
-        best_weights = None
-        
-        # Iterar sobre os pesos para calcular o Sharpe Ratio
-        for w in tqdm(weights, total=n_simulations, desc=f"Simulações {tickers[0]}...", leave=False, unit="sim"):
-            try:
-                # Validação adicional para garantir que os pesos respeitam w_i <= 0.2
-                if any(wi > 0.2 for wi in w):
-                    logging.debug(f"Peso inválido detectado: {w}, ignorando simulação")
-                    continue
-                
-                # Calcular retorno e volatilidade da carteira
-                port_ret = annualized_return(portfolio_return(w, returns))
-                port_vol = portfolio_volatility(w, cov_matrix)
-                if port_vol == 0:
-                    logging.debug("Volatilidade zero detectada, ignorando simulação")
-                    continue
-                
-                # Calcular Sharpe Ratio
-                sharpe = sharpe_ratio(port_ret, port_vol)
-                if np.isnan(sharpe) or np.isinf(sharpe):
-                    logging.debug("Sharpe Ratio inválido (NaN ou Inf)")
-                    continue
-                
-                # Atualizar melhor resultado
-                if sharpe > best_sharpe:
-                    best_sharpe = sharpe
-                    best_weights = w
-                    logging.debug(f"Novo melhor Sharpe: {sharpe:.4f}")
-            except Exception as e:
-                logging.error(f"Erro na simulação de pesos: {e}", exc_info=True)
-                continue
-        
-        # Verificar se encontrou uma simulação válida
-        if best_weights is None:
-            logging.error("Nenhum Sharpe Ratio válido calculado")
-            raise ValueError("Nenhuma simulação válida concluída")
+        # Calcular todos os Sharpe Ratios em lote e descartar simulações inválidas
+        with instrumentation.stage('scoring'):
+            sharpes = batch_sharpe_from_moments(weights, mean_returns, cov_matrix)
+            valid = np.all(weights <= 0.2, axis=1) & np.isfinite(sharpes)
+            if not np.any(valid):
+                logging.error("Nenhum Sharpe Ratio válido calculado")
+                raise ValueError("Nenhuma simulação válida concluída")
+            sharpes = np.where(valid, sharpes, -np.inf)
+
+            # Encontrar o melhor resultado
+            best_index = int(np.argmax(sharpes))
+        instrumentation.count('simulations', n_simulations)
+        best_sharpe = float(sharpes[best_index])
+        best_weights = weights[best_index]
         
-        logging.info(f"Melhor Sharpe para {tickers}: {best_sharpe:.4f}")
-        return best_weights, best_sharpe, returns
+        logging.info("Melhor Sharpe para %s: %.4f", tickers, best_sharpe)
+        return best_weights, best_sharpe
     except Exception as e:
-        logging.error(f"Erro na simulação de {tickers}: {e}", exc_info=True)
-        raise
\ No newline at end of file
+        logging.error("Erro na simulação de %s: %s", tickers, e, exc_info=True)
+        raise
+
+def simulate_rank_range(stats: ReturnStatistics, start: int, count: int, k: int, seed: int, n_simulations: int = 1000, sampler: str = 'random') -> Tuple[np.ndarray, int]:
+    """Simula as combinações de ranks [start, start + count) de k tickers de stats.tickers.
+
+    As combinações são geradas sob demanda a partir do rank (ver combinatorics) e cada uma usa
+    o gerador combination_rng(seed, rank). Retorna os registros compactos das combinações
+    válidas (ver collector.result_dtype) e o número de falhas.
+    """
+    records = np.empty(count, dtype=result_dtype(k))
+    n_valid = 0
+    for rank, combination in enumerate(iter_combination_range(start, count, len(stats.tickers), k), start):
+        tickers = [stats.tickers[i] for i in combination]
+        try:
+            weights, sharpe = simulate_portfolio(tickers, stats, n_simulations=n_simulations, rng=combination_rng(seed, rank), sampler=sampler)
+            records[n_valid] = (rank, sharpe, weights)
+            n_valid += 1
+            instrumentation.count('combinations')
+        except Exception as e:
+            logging.error("Erro na simulação %s: %s", tickers, str(e), exc_info=True)
+    return records[:n_valid], count - n_valid
@@ -1,9 +1,25 @@
+import functools
 import numpy as np
-import pandas as pd
 import logging
+from typing import TYPE_CHECKING, Dict, NamedTuple, Optional, Sequence, Tuple
+import instrumentation
 
-def calculate_daily_returns(prices: pd.DataFrame) -> np.ndarray:
+if TYPE_CHECKING:
+    # Só para anotações: os workers importam este módulo e não devem carregar o pandas
+    import pandas as pd
+
+
+class ReturnStatistics(NamedTuple):
+    """Estatísticas de retorno do universo completo de tickers, calculadas uma única vez."""
+    tickers: Tuple[str, ...]
+    ticker_index: Dict[str, int]
+    returns: np.ndarray       # Retornos diários (n_dias x n_tickers)
+    mean_returns: np.ndarray  # Média dos retornos diários por ticker
+    cov_matrix: np.ndarray    # Matriz de covariância anualizada
+
+def calculate_daily_returns(prices: 'pd.DataFrame') -> np.ndarray:
     """Calcula retornos diários a partir de preços."""
+    import pandas as pd
     logging.debug("Calculando retornos diários")
     try:
         if not isinstance(prices, pd.DataFrame):
@@ -18,14 +34,14 @@ def calculate_daily_returns(prices: pd.DataFrame) -> np.ndarray:
         returns_array = returns.to_numpy()
         if returns_array.ndim == 1:
             returns_array = returns_array.reshape(-1, 1)
-        logging.debug(f"Retornos calculados: shape {returns_array.shape}")
+        logging.debug("Retornos calculados: shape %s", returns_array.shape)
         return returns_array
     except Exception as e:
-        logging.error(f"Erro ao calcular retornos diários: {e}", exc_info=True)
+        logging.error("Erro ao calcular retornos diários: %s", e, exc_info=True)
         raise
 
 def generate_random_weights(n_tickers: int, n_simulations: int) -> np.ndarray:
-    logging.debug(f"Gerando {n_simulations} pesos para {n_tickers} tickers")
+    logging.debug("Gerando %s pesos para %s tickers", n_simulations, n_tickers)
     try:
         weights_list = []
         attempts = 0
@@ -42,30 +58,207 @@ def generate_random_weights(n_tickers: int, n_simulations: int) -> np.ndarray:
         if len(weights_list) < n_simulations:
             raise ValueError(f"Gerou apenas {len(weights_list)} pesos válidos após {max_attempts} tentativas")
         weights = np.array(weights_list)
-        logging.debug(f"Pesos gerados: shape {weights.shape}")
+        logging.debug("Pesos gerados: shape %s", weights.shape)
         return weights
     except Exception as e:
-        logging.error(f"Erro ao gerar pesos: {e}", exc_info=True)
+        logging.error("Erro ao gerar pesos: %s", e, exc_info=True)
+        raise
+
+
+def combination_rng(seed: int, rank: int) -> np.random.Generator:
+    """Gerador independente para a combinação `rank`, derivado da semente global da execução.
+
+    Depende apenas de (seed, rank), então o resultado é o mesmo qualquer que seja a divisão
+    do trabalho entre workers.
+    """
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(rank,)))
+
+def _cap_weights(weights: np.ndarray, max_weight: float) -> np.ndarray:
+    """Redistribui, linha a linha, o excesso acima de max_weight entre os pesos ainda abaixo do limite."""
+    weights = weights.copy()
+    for _ in range(weights.shape[1]):
+        over = weights > max_weight
+        if not np.any(over):
+            break
+        excess = np.where(over, weights - max_weight, 0.0).sum(axis=1, keepdims=True)
+        weights = np.minimum(weights, max_weight)
+        free = weights < max_weight
+        free_mass = np.where(free, weights, 0.0).sum(axis=1, keepdims=True)
+        weights = np.where(free, weights + excess * weights / np.where(free_mass > 0, free_mass, 1.0), weights)
+    return weights
+
+def _initial_acceptance(n_tickers: int, max_weight: float) -> float:
+    """Estimativa conservadora da taxa de aceitação do sorteio limitado (limite de Bonferroni)."""
+    return max(1 - n_tickers * (1 - max_weight) ** (n_tickers - 1), 0.05)
+
+def sample_capped_simplex(n_tickers: int, n_simulations: int, rng: np.random.Generator, max_weight: float = 0.2, max_rounds: int = 8) -> np.ndarray:
+    """Sorteia n_simulations vetores de pesos com soma 1, w >= 0 e w <= max_weight em lote.
+
+    Os vetores são uniformes no simplex (Dirichlet(1), via exponenciais normalizadas) condicionados
+    ao limite por ativo: cada rodada sorteia um bloco e descarta as linhas que violam o limite.
+    Se a taxa de aceitação for baixa demais (poucos tickers), as linhas que faltarem após
+    max_rounds têm o excesso redistribuído, o que ainda respeita as restrições.
+    """
+    logging.debug("Sorteando %s pesos para %s tickers no simplex limitado", n_simulations, n_tickers)
+    try:
+        if n_tickers * max_weight < 1 - 1e-12:
+            raise ValueError(f"Impossível somar 1 com {n_tickers} tickers e peso máximo {max_weight}")
+        if n_tickers * max_weight <= 1 + 1e-12:
+            return np.full((n_simulations, n_tickers), 1.0 / n_tickers)
+
+        acceptance = _initial_acceptance(n_tickers, max_weight)
+        accepted = []
+        n_accepted = 0
+        for _ in range(max_rounds):
+            missing = n_simulations - n_accepted
+            if missing <= 0:
+                break
+            draws = rng.standard_exponential((int(np.ceil(missing / acceptance * 1.1)) + 1, n_tickers))
+            draws /= draws.sum(axis=1, keepdims=True)
+            valid = draws[draws.max(axis=1) <= max_weight]
+            accepted.append(valid[:missing])
+            n_accepted += len(accepted[-1])
+            acceptance = max(len(valid) / len(draws), 0.05)
+
+        missing = n_simulations - n_accepted
+        if missing > 0:
+            draws = rng.standard_exponential((missing, n_tickers))
+            accepted.append(_cap_weights(draws / draws.sum(axis=1, keepdims=True), max_weight))
+        return np.concatenate(accepted)
+    except Exception as e:
+        logging.error("Erro ao sortear pesos: %s", e, exc_info=True)
+        raise
+
+def sample_capped_simplex_block(n_tickers: int, n_simulations: int, seed: int, ranks: Sequence[int], max_weight: float = 0.2, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Equivale a empilhar sample_capped_simplex(n_tickers, n_simulations, combination_rng(seed, rank)) para cada rank.
+
+    Só os sorteios exponenciais saem do gerador de cada combinação, um a um; teste do limite,
+    seleção das primeiras n_simulations linhas válidas e normalização são feitos para o bloco
+    inteiro de uma vez, e só as linhas aceitas são normalizadas. As combinações que não completam
+    n_simulations na primeira rodada (raras com muitos tickers) são refeitas por
+    sample_capped_simplex com o mesmo gerador, então o resultado é idêntico ao do sorteio por
+    combinação. Retorna (ou preenche `out`) um array len(ranks) x n_simulations x n_tickers.
+    """
+    if out is None:
+        out = np.empty((len(ranks), n_simulations, n_tickers))
+    if n_tickers * max_weight <= 1 + 1e-12:
+        for b, rank in enumerate(ranks):
+            out[b] = sample_capped_simplex(n_tickers, n_simulations, combination_rng(seed, rank), max_weight)
+        return out
+
+    n_draws = int(np.ceil(n_simulations / _initial_acceptance(n_tickers, max_weight) * 1.1)) + 1
+    draws = np.empty((len(ranks), n_draws, n_tickers))
+    for b, rank in enumerate(ranks):
+        combination_rng(seed, rank).standard_exponential(out=draws[b])
+    sums = draws.sum(axis=2)
+    # max(x / soma) == max(x) / soma com o mesmo arredondamento, sem normalizar as linhas descartadas
+    valid = draws.max(axis=2) / sums <= max_weight
+    keep = valid & (np.cumsum(valid, axis=1) <= n_simulations)
+    short = np.flatnonzero(valid.sum(axis=1) < n_simulations)
+    keep[short] = False
+    keep[short, :n_simulations] = True
+    np.divide(draws[keep].reshape(out.shape), sums[keep].reshape(len(ranks), n_simulations, 1), out=out)
+    for b in short:
+        out[b] = sample_capped_simplex(n_tickers, n_simulations, combination_rng(seed, ranks[b]), max_weight)
+    return out
+
+def _first_primes(n: int) -> np.ndarray:
+    """Os n primeiros números primos (bases da sequência de Halton)."""
+    limit = max(16, int(n * (np.log(n + 1) + np.log(np.log(n + 2)) + 3)))
+    sieve = np.ones(limit, dtype=bool)
+    sieve[:2] = False
+    for p in range(2, int(limit ** 0.5) + 1):
+        if sieve[p]:
+            sieve[p * p::p] = False
+    return np.flatnonzero(sieve)[:n]
+
+@functools.lru_cache(maxsize=8)
+def _halton_digits(n_points: int, dim: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Dígitos dos índices 1..n_points em cada base, empilhados (uma linha por dimensão e posição).
+
+    Não dependem do embaralhamento, então são calculados uma vez por (n_points, dim). Retorna a
+    base de cada linha, os dígitos já deslocados para indexar uma tabela achatada de permutações
+    (linhas x maior base), a matriz (dim x linhas) que soma os dígitos de cada dimensão com peso
+    base^-posição e o peso do último dígito de cada dimensão.
+    """
+    index = np.arange(1, n_points + 1)
+    bases, weights, rows = [], [], []
+    for base in _first_primes(dim):
+        n_digits = int(np.ceil(np.log(n_points + 1) / np.log(base))) + 1
+        bases.extend([base] * n_digits)
+        weights.append(float(base) ** -np.arange(1.0, n_digits + 1))
+        rows.append((index // base ** np.arange(n_digits)[:, None]) % base)
+    bases = np.array(bases)
+    flat_digits = np.concatenate(rows) + (np.arange(len(bases)) * bases.max())[:, None]
+    weight_matrix = np.zeros((dim, len(bases)))
+    column = 0
+    for j, w in enumerate(weights):
+        weight_matrix[j, column:column + len(w)] = w
+        column += len(w)
+    return bases, flat_digits, weight_matrix, np.array([w[-1] for w in weights])
+
+def halton_sequence(n_points: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    """Primeiros n_points pontos da sequência de Halton em [0, 1)^dim, embaralhada por `rng`.
+
+    Cada dígito na base de cada dimensão passa por uma permutação aleatória (o que quebra a
+    correlação entre dimensões de bases grandes) e o resto abaixo do último dígito é sorteado
+    uniformemente, então cada ponto é uniforme em [0, 1)^dim e o conjunto mantém a baixa
+    discrepância.
+    """
+    bases, flat_digits, weight_matrix, tail = _halton_digits(n_points, dim)
+    # Uma permutação de 0..base-1 por linha: as colunas além da base ficam por último no argsort
+    keys = rng.random((len(bases), bases.max()))
+    keys[np.arange(bases.max()) >= bases[:, None]] = np.inf
+    permuted = keys.argsort(axis=1).astype(float).ravel()[flat_digits]
+    return (weight_matrix @ permuted).T + rng.random((n_points, dim)) * tail
+
+def sample_capped_simplex_qmc(n_tickers: int, n_simulations: int, rng: np.random.Generator, max_weight: float = 0.2) -> np.ndarray:
+    """Como sample_capped_simplex, mas a partir de pontos quase-aleatórios (Halton embaralhada).
+
+    Cada ponto vira um vetor uniforme no simplex pelas exponenciais normalizadas. Como a rejeição
+    desfaria a cobertura regular dos pontos, as linhas acima do limite têm o excesso
+    redistribuído (_cap_weights) em vez de descartadas.
+    """
+    logging.debug("Gerando %s pesos quase-aleatórios para %s tickers no simplex limitado", n_simulations, n_tickers)
+    try:
+        if n_tickers * max_weight < 1 - 1e-12:
+            raise ValueError(f"Impossível somar 1 com {n_tickers} tickers e peso máximo {max_weight}")
+        if n_tickers * max_weight <= 1 + 1e-12:
+            return np.full((n_simulations, n_tickers), 1.0 / n_tickers)
+        draws = -np.log1p(-halton_sequence(n_simulations, n_tickers, rng))
+        draws /= draws.sum(axis=1, keepdims=True)
+        over = draws.max(axis=1) > max_weight
+        if np.any(over):
+            draws[over] = _cap_weights(draws[over], max_weight)
+        return draws
+    except Exception as e:
+        logging.error("Erro ao gerar pesos quase-aleatórios: %s", e, exc_info=True)
         raise
 
+# Amostradores de pesos selecionáveis por nome (--sampler)
+WEIGHT_SAMPLERS = {
+    'random': sample_capped_simplex,
+    'qmc': sample_capped_simplex_qmc,
+}
+
 
 def portfolio_return(weights: np.ndarray, returns: np.ndarray) -> np.ndarray:
     """Calcula o retorno da carteira."""
     logging.debug("Calculando retorno da carteira")
     try:
         if returns.ndim != 2:
-            logging.error(f"Retornos não são 2D: shape {returns.shape}")
+            logging.error("Retornos não são 2D: shape %s", returns.shape)
             raise ValueError("Retornos devem ser um array 2D")
         
         if weights.ndim != 1:
-            logging.error(f"Pesos não são 1D: shape {weights.shape}")
+            logging.error("Pesos não são 1D: shape %s", weights.shape)
             raise ValueError("Pesos devem ser 1D para uma simulação")
         
         ret = returns @ weights
-        logging.debug(f"Retorno da carteira calculado: shape {ret.shape}")
+        logging.debug("Retorno da carteira calculado: shape %s", ret.shape)
         return ret
     except Exception as e:
-        logging.error(f"Erro ao calcular retorno da carteira: {e}", exc_info=True)
+        logging.error("Erro ao calcular retorno da carteira: %s", e, exc_info=True)
         raise
 
 def annualized_return(portfolio_returns: np.ndarray) -> float:
@@ -74,10 +267,10 @@ def annualized_return(portfolio_returns: np.ndarray) -> float:
     try:
         mean_daily_return = np.mean(portfolio_returns)
         annualized = (1 + mean_daily_return) ** 252 - 1
-        logging.debug(f"Retorno anualizado: {annualized:.4f}")
+        logging.debug("Retorno anualizado: %.4f", annualized)
         return annualized
     except Exception as e:
-        logging.error(f"Erro ao calcular retorno anualizado: {e}", exc_info=True)
+        logging.error("Erro ao calcular retorno anualizado: %s", e, exc_info=True)
         raise
 
 def portfolio_volatility(weights: np.ndarray, cov_matrix: np.ndarray) -> float:
@@ -85,10 +278,10 @@ def portfolio_volatility(weights: np.ndarray, cov_matrix: np.ndarray) -> float:
     logging.debug("Calculando volatilidade da carteira")
     try:
         vol = np.sqrt(np.dot(weights.T, np.dot(cov_matrix, weights)))
-        logging.debug(f"Volatilidade calculada: {vol:.4f}")
+        logging.debug("Volatilidade calculada: %.4f", vol)
         return vol
     except Exception as e:
-        logging.error(f"Erro ao calcular volatilidade: {e}", exc_info=True)
+        logging.error("Erro ao calcular volatilidade: %s", e, exc_info=True)
         raise
 
 def sharpe_ratio(port_return: float, port_volatility: float, risk_free_rate: float = 0.02) -> float:
@@ -99,8 +292,95 @@ def sharpe_ratio(port_return: float, port_volatility: float, risk_free_rate: flo
             logging.warning("Volatilidade zero, retornando -inf")
             return -np.inf
         sharpe = (port_return - risk_free_rate) / port_volatility
-        logging.debug(f"Sharpe Ratio calculado: {sharpe:.4f}")
+        logging.debug("Sharpe Ratio calculado: %.4f", sharpe)
         return sharpe
     except Exception as e:
-        logging.error(f"Erro ao calcular Sharpe Ratio: {e}", exc_info=True)
-        raise
\ No newline at end of file
+        logging.error("Erro ao calcular Sharpe Ratio: %s", e, exc_info=True)
+        raise
+
+def compute_return_statistics(prices: 'pd.DataFrame') -> ReturnStatistics:
+    """Calcula retornos diários, vetor de médias e covariância anualizada de todos os tickers de uma vez."""
+    logging.debug("Pré-calculando estatísticas de retorno do universo")
+    try:
+        with instrumentation.stage('returns'):
+            returns = calculate_daily_returns(prices)
+        if np.all(np.isnan(returns)):
+            logging.error("Matriz de retornos contém apenas NaN")
+            raise ValueError("Matriz de retornos inválida")
+
+        with instrumentation.stage('covariance'):
+            cov_matrix = np.atleast_2d(np.cov(returns.T)) * 252
+        if np.any(np.isnan(cov_matrix)) or np.any(np.isinf(cov_matrix)):
+            logging.error("Matriz de covariância contém NaN ou Inf")
+            raise ValueError("Matriz de covariância inválida")
+
+        tickers = tuple(prices.columns)
+        stats = ReturnStatistics(
+            tickers=tickers,
+            ticker_index={t: i for i, t in enumerate(tickers)},
+            returns=returns,
+            mean_returns=returns.mean(axis=0),
+            cov_matrix=cov_matrix,
+        )
+        logging.debug("Estatísticas calculadas: %s dias, %s tickers", returns.shape[0], returns.shape[1])
+        return stats
+    except Exception as e:
+        logging.error("Erro ao pré-calcular estatísticas: %s", e, exc_info=True)
+        raise
+
+def ticker_indices(stats: ReturnStatistics, tickers: Sequence[str]) -> np.ndarray:
+    """Converte tickers em índices de coluna das estatísticas pré-calculadas."""
+    missing_tickers = [t for t in tickers if t not in stats.ticker_index]
+    if missing_tickers:
+        logging.error("Tickers ausentes nas estatísticas: %s", missing_tickers)
+        raise ValueError(f"Tickers ausentes: {missing_tickers}")
+    return np.fromiter((stats.ticker_index[t] for t in tickers), dtype=np.intp, count=len(tickers))
+
+def subset_statistics(stats: ReturnStatistics, idx: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Retorna o sub-vetor de médias e a sub-matriz de covariância de uma combinação por fatiamento."""
+    return stats.mean_returns[idx], stats.cov_matrix[np.ix_(idx, idx)]
+
+def sharpe_from_moments(mean_daily_returns: np.ndarray, variances: np.ndarray, risk_free_rate: float) -> np.ndarray:
+    annualized = (1 + mean_daily_returns) ** 252 - 1
+    volatilities = np.sqrt(np.maximum(variances, 0.0))
+    sharpes = np.full(variances.shape[0], -np.inf)
+    valid = volatilities > 0
+    sharpes[valid] = (annualized[valid] - risk_free_rate) / volatilities[valid]
+    return sharpes
+
+def batch_sharpe_ratios(weights: np.ndarray, returns: np.ndarray, cov_matrix: np.ndarray, risk_free_rate: float = 0.02) -> np.ndarray:
+    """Calcula o Sharpe Ratio de todas as linhas de uma matriz de pesos (n_simulações x n_tickers) de uma vez.
+
+    Equivale a aplicar portfolio_return, annualized_return, portfolio_volatility e sharpe_ratio
+    a cada linha, mas com poucas operações matriciais. Volatilidade zero resulta em -inf.
+    """
+    logging.debug("Calculando Sharpe Ratio em lote")
+    try:
+        if weights.ndim != 2:
+            logging.error("Pesos não são 2D: shape %s", weights.shape)
+            raise ValueError("Pesos devem ser um array 2D (n_simulações x n_tickers)")
+        if returns.ndim != 2:
+            logging.error("Retornos não são 2D: shape %s", returns.shape)
+            raise ValueError("Retornos devem ser um array 2D")
+
+        mean_daily_returns = np.mean(returns @ weights.T, axis=0)
+        variances = np.einsum('ij,ij->i', weights @ cov_matrix, weights)
+        return sharpe_from_moments(mean_daily_returns, variances, risk_free_rate)
+    except Exception as e:
+        logging.error("Erro ao calcular Sharpe Ratio em lote: %s", e, exc_info=True)
+        raise
+
+def batch_sharpe_from_moments(weights: np.ndarray, mean_returns: np.ndarray, cov_matrix: np.ndarray, risk_free_rate: float = 0.02) -> np.ndarray:
+    """Igual a batch_sharpe_ratios, mas usa o vetor de médias diárias em vez da matriz de retornos."""
+    logging.debug("Calculando Sharpe Ratio em lote a partir dos momentos")
+    try:
+        if weights.ndim != 2:
+            logging.error("Pesos não são 2D: shape %s", weights.shape)
+            raise ValueError("Pesos devem ser um array 2D (n_simulações x n_tickers)")
+
+        mean_daily_returns = weights @ mean_returns
+        variances = np.einsum('ij,ij->i', weights @ cov_matrix, weights)
+        return sharpe_from_moments(mean_daily_returns, variances, risk_free_rate)
+    except Exception as e:
+        logging.error("Erro ao calcular Sharpe Ratio em lote: %s", e, exc_info=True)
+        raise
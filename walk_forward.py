@@ -0,0 +1,219 @@
+"""Reotimização walk-forward: desliza a janela de treino um dia por vez sobre o histórico de preços.
+
+A cada passo as estatísticas da janela são atualizadas com duas atualizações de posto um
+(sai o dia mais antigo, entra o novo) em vez de recalcular np.cov; as top-K carteiras
+retidas são reavaliadas com as novas estatísticas, e a busca completa só é refeita quando
+a ordem delas deixa de ser estável. A latência de cada passo vai para results/walk_forward.csv.
+
+Uso: python walk_forward.py [--data-source synthetic] [--end 2025-06-30] [--engine optimizer]
+                            [--stop-rank 20000] [--min-rank-correlation 0.5]
+"""
+import argparse
+import logging
+import os
+import time
+from multiprocessing import Pool
+from typing import Optional, Sequence
+
+import numpy as np
+
+from collector import ResultCollector
+from combinatorics import n_combinations, rank_ranges
+from engine import RANGE_ENGINES
+from evaluation import embed_weights
+from shared_data import publish_statistics, release_statistics
+from worker import init_worker, run_attached_range
+from utils import ReturnStatistics, calculate_daily_returns, sharpe_from_moments
+
+class RollingStatistics:
+    """Média e covariância anualizada de uma janela deslizante de retornos diários, atualizadas por posto um.
+
+    Guarda a média e a matriz de co-momentos M = sum((x - média)(x - média)'); incluir ou
+    remover um dia é uma atualização de Welford, O(N^2) em vez do O(T N^2) de np.cov. A cada
+    refresh_every passos tudo é recalculado do zero para conter o erro de arredondamento.
+    """
+
+    def __init__(self, returns: np.ndarray, tickers: Sequence[str], window: int, refresh_every: int = 250):
+        if window < 2 or window > len(returns):
+            raise ValueError(f"Janela inválida: {window} dias para {len(returns)} retornos")
+        self.returns = returns
+        self.tickers = tuple(tickers)
+        self.ticker_index = {t: i for i, t in enumerate(self.tickers)}
+        self.window = window
+        self.refresh_every = refresh_every
+        self.end = window
+        self._recompute()
+
+    def _recompute(self) -> None:
+        rows = self.returns[self.end - self.window:self.end]
+        self.mean = rows.mean(axis=0)
+        centered = rows - self.mean
+        self.comoment = centered.T @ centered
+        self._steps_since_refresh = 0
+
+    def _add(self, x: np.ndarray, n: int) -> None:
+        """Inclui x em uma janela que passa a ter n dias."""
+        delta = x - self.mean
+        self.mean += delta / n
+        self.comoment += np.outer(delta, x - self.mean)
+
+    def _remove(self, x: np.ndarray, n: int) -> None:
+        """Remove x de uma janela que passa a ter n dias."""
+        delta = x - self.mean
+        self.mean -= delta / n
+        self.comoment -= np.outer(delta, x - self.mean)
+
+    def advance(self) -> bool:
+        """Desliza a janela um dia; retorna False quando não há mais dias."""
+        if self.end >= len(self.returns):
+            return False
+        self._remove(self.returns[self.end - self.window], self.window - 1)
+        self._add(self.returns[self.end], self.window)
+        self.end += 1
+        self._steps_since_refresh += 1
+        if self._steps_since_refresh >= self.refresh_every:
+            self._recompute()
+        return True
+
+    def statistics(self) -> ReturnStatistics:
+        return ReturnStatistics(
+            tickers=self.tickers,
+            ticker_index=self.ticker_index,
+            returns=self.returns[self.end - self.window:self.end],
+            mean_returns=self.mean.copy(),
+            cov_matrix=self.comoment * (252 / (self.window - 1)),
+        )
+
+def rescore(stats: ReturnStatistics, records: np.ndarray, combination_size: int, risk_free_rate: float = 0.02) -> np.ndarray:
+    """Sharpe das carteiras em `records` (ver collector.result_dtype) sob novas estatísticas, em um só produto."""
+    weights = embed_weights(records, len(stats.tickers), combination_size)
+    means = weights @ stats.mean_returns
+    variances = np.einsum('ij,ij->i', weights @ stats.cov_matrix, weights)
+    return sharpe_from_moments(means, variances, risk_free_rate)
+
+def rank_correlation(before: np.ndarray, after: np.ndarray, tie_tolerance: float = 1e-6) -> float:
+    """Tau de Kendall entre duas avaliações das mesmas carteiras.
+
+    Pares praticamente empatados na avaliação anterior são ignorados, para que a troca entre
+    carteiras equivalentes não conte como instabilidade.
+    """
+    before_diff = before[:, None] - before[None, :]
+    before_sign = np.where(np.abs(before_diff) < tie_tolerance, 0.0, np.sign(before_diff))
+    after_sign = np.sign(after[:, None] - after[None, :])
+    upper = np.triu_indices(len(before), 1)
+    compared = np.count_nonzero(before_sign[upper])
+    if compared == 0:
+        return 1.0
+    return float((before_sign[upper] * after_sign[upper]).sum() / compared)
+
+def search_top_k(stats: ReturnStatistics, combination_size: int, top_k: int, engine: str, seed: int, chunk_size: int, processes: int, stop_rank: Optional[int] = None) -> np.ndarray:
+    """Busca completa (paralela se processes > 1) e devolve os top-K registros em ordem decrescente."""
+    stop = n_combinations(len(stats.tickers), combination_size) if stop_rank is None else stop_rank
+    collector = ResultCollector(top_k, combination_size)
+    if processes <= 1:
+        score_range = RANGE_ENGINES[engine]
+        for start, count in rank_ranges(0, stop, chunk_size):
+            collector.add(*score_range(stats, start, count, combination_size, seed))
+        return collector.top()
+    handles, spec = publish_statistics(stats, backend='shared')
+    try:
+        with Pool(processes=processes, initializer=init_worker, initargs=(spec, seed, combination_size, engine)) as pool:
+            tasks = ((start, count, time.time()) for start, count in rank_ranges(0, stop, chunk_size))
+            for _, _, records, failures, _ in pool.imap_unordered(run_attached_range, tasks):
+                collector.add(records, failures)
+    finally:
+        release_statistics(handles)
+    return collector.top()
+
+def main() -> None:
+    # pandas e o carregamento de dados só aqui: os workers do Pool (spawn/forkserver) importam este
+    # módulo para achar as funções e devem carregar apenas o que worker.py carrega
+    import pandas as pd
+    from data_loader import TRAIN_PERIOD, get_dow_jones_tickers, load_prices, make_source, PriceCache
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data-source', choices=['yfinance', 'local', 'synthetic'], default='yfinance')
+    parser.add_argument('--prices-file', default=None)
+    parser.add_argument('--cache-dir', default='results/cache')
+    parser.add_argument('--start', default=TRAIN_PERIOD[0], help="Início da primeira janela de treino")
+    parser.add_argument('--end', default='2025-06-30', help="Data final (exclusiva) do histórico percorrido")
+    parser.add_argument('--window', type=int, default=None,
+                        help="Dias de retorno por janela; por padrão, os de --start até o fim do período de treino")
+    parser.add_argument('--engine', choices=sorted(RANGE_ENGINES), default='per-combination')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--combination-size', type=int, default=25)
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--chunk-size', type=int, default=50)
+    parser.add_argument('--processes', type=int, default=6)
+    parser.add_argument('--stop-rank', type=int, default=None, help="Limita a busca completa aos ranks [0, stop)")
+    parser.add_argument('--min-rank-correlation', type=float, default=0.5,
+                        help="Tau de Kendall mínimo entre a ordem anterior e a nova das top-K para não refazer a busca")
+    parser.add_argument('--full-search-every', type=int, default=0,
+                        help="Refaz a busca completa ao menos a cada N passos (0 desativa)")
+    parser.add_argument('--output', default='results/walk_forward.csv')
+    args = parser.parse_args()
+
+    source = make_source(args.data_source, args.prices_file)
+    prices = load_prices(get_dow_jones_tickers(), args.start, args.end, source=source, cache=PriceCache(args.cache_dir))
+    tickers = [t for t in get_dow_jones_tickers() if t in prices.columns]
+    prices = prices[tickers]
+    returns = calculate_daily_returns(prices)
+    dates = prices.index[-len(returns):]
+    # Por padrão, a primeira janela termina no fim do período de treino de main.py
+    window = args.window or int(np.count_nonzero(prices.index < pd.Timestamp(TRAIN_PERIOD[1]))) - 1
+    rolling = RollingStatistics(returns, tickers, min(window, len(returns)))
+    k = args.combination_size
+
+    def full_search(stats: ReturnStatistics) -> np.ndarray:
+        return search_top_k(stats, k, args.top_k, args.engine, args.seed, args.chunk_size, args.processes, args.stop_rank)
+
+    start = time.perf_counter()
+    candidates = full_search(rolling.statistics())
+    logging.warning("Busca inicial (janela até %s): %.2fs", dates[rolling.end - 1].date(), time.perf_counter() - start)
+    previous_sharpe = candidates['sharpe'].copy()
+    steps = []
+    since_search = 0
+    while True:
+        step_start = time.perf_counter()
+        if not rolling.advance():
+            break
+        stats = rolling.statistics()
+        update_seconds = time.perf_counter() - step_start
+        sharpe = rescore(stats, candidates, k)
+        tau = rank_correlation(previous_sharpe, sharpe)
+        since_search += 1
+        searched = tau < args.min_rank_correlation or (args.full_search_every and since_search >= args.full_search_every)
+        if searched:
+            candidates = full_search(stats)
+            sharpe = candidates['sharpe'].copy()
+            since_search = 0
+        else:
+            order = np.argsort(-sharpe, kind='stable')
+            candidates, sharpe = candidates[order], sharpe[order]
+            candidates['sharpe'] = sharpe
+        previous_sharpe = sharpe
+        steps.append({
+            'date': dates[rolling.end - 1].date(),
+            'latency_seconds': time.perf_counter() - step_start,
+            'update_seconds': update_seconds,
+            'kendall_tau': tau,
+            'full_search': bool(searched),
+            'best_rank': int(candidates['rank'][0]),
+            'best_sharpe': float(sharpe[0]),
+        })
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    table = pd.DataFrame(steps)
+    table.to_csv(args.output, index=False)
+    if table.empty:
+        print("Nenhum dia além da janela inicial")
+        return
+    incremental = table[~table['full_search']]
+    searched = table[table['full_search']]
+    print(f"{len(table)} passos: {len(incremental)} incrementais (latência média "
+          f"{incremental['latency_seconds'].mean() * 1e3 if len(incremental) else float('nan'):.2f} ms), "
+          f"{len(searched)} com busca completa (média {searched['latency_seconds'].mean() if len(searched) else float('nan'):.2f} s)")
+    print(f"Tabela por passo salva em {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+# Pontos de entrada dos processos worker. Este módulo (e tudo o que ele importa) deve depender
+# apenas de NumPy e da biblioteca padrão: sob spawn/forkserver, e a cada reciclagem por
+# maxtasksperchild, cada worker novo paga o custo dessas importações antes da primeira tarefa.
+import numpy as np
+from typing import Optional, Tuple
+from engine import RANGE_ENGINES
+from shared_data import SharedDataSpec, attach_array
+from utils import ReturnStatistics
+import instrumentation
+
+# Estado do processo worker, preenchido uma vez pelo initializer do Pool
+_worker_stats = None
+_worker_combination_size = None
+_worker_handles = []
+_worker_seed = None
+_worker_engine = None
+_worker_options = {}
+
+def init_worker(spec: SharedDataSpec, seed: int, combination_size: int, engine: str = 'per-combination', n_simulations: int = 1000, sampler: str = 'random') -> None:
+    """Initializer do Pool: anexa os arrays publicados e reconstrói as estatísticas no worker."""
+    global _worker_stats, _worker_combination_size, _worker_handles, _worker_seed, _worker_engine, _worker_options
+    _worker_seed = seed
+    _worker_engine = RANGE_ENGINES[engine]
+    _worker_options = {'n_simulations': n_simulations, 'sampler': sampler}
+    _worker_combination_size = combination_size
+    views = {}
+    _worker_handles = []
+    for key, array_spec in spec.arrays.items():
+        handle, views[key] = attach_array(array_spec)
+        _worker_handles.append(handle)
+    _worker_stats = ReturnStatistics(
+        tickers=spec.tickers,
+        ticker_index={t: i for i, t in enumerate(spec.tickers)},
+        returns=views['returns'],
+        mean_returns=views['mean_returns'],
+        cov_matrix=views['cov_matrix'],
+    )
+
+def run_attached_range(task: Tuple[int, int, float]) -> Tuple[int, int, np.ndarray, int, Optional[dict]]:
+    """Executa as combinações de ranks [start, start + count) usando os dados anexados pelo init_worker.
+
+    `task` traz também o instante de envio, usado pela instrumentação para medir a espera na fila.
+    """
+    start, count, sent_at = task
+    instrumentation.record_queue_wait(sent_at)
+    records, failures = _worker_engine(_worker_stats, start, count, _worker_combination_size, _worker_seed, **_worker_options)
+    return start, count, records, failures, instrumentation.worker_telemetry()
+
+def run_simulation_range(args: tuple) -> tuple:
+    """Executa simulações para um intervalo de ranks de combinações (modo pickle)."""
+    start, count, train_stats, combination_size, seed, engine, n_simulations, sampler, sent_at = args
+    instrumentation.record_queue_wait(sent_at)
+    records, failures = RANGE_ENGINES[engine](train_stats, start, count, combination_size, seed, n_simulations, sampler)
+    return start, count, records, failures, instrumentation.worker_telemetry()